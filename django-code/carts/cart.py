@@ -1,57 +1,124 @@
 from decimal import Decimal
 from django.conf import settings
+from django.utils.module_loading import import_string
 from products.models import Product
 from typing import TypedDict, Iterator
 
+from carts.storage import CartStorage
+
+# columns the cart, cart page and checkout read from Product
+CART_PRODUCT_FIELDS = ('id', 'name', 'price', 'stock')
+
 class CartItem(TypedDict):
     quantity: int
-    price: int
+    price: Decimal
     product: Product
-    total_price: int
+    total_price: Decimal
+    added_price: Decimal
+    price_changed: bool
+    out_of_stock: bool
+
+class CartSnapshot(TypedDict):
+    items: list[CartItem]
+    total_price: Decimal
+    # ids kept in the cart whose product no longer exists
+    missing_product_ids: list[int]
+    has_drift: bool
 
 class Cart:
     def __init__(self, request):
-        self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        storage_class: type[CartStorage] = import_string(settings.CART_STORAGE_BACKEND)
+        self.storage = storage_class(request)
+        self._snapshot = None
 
-    def add(self, product: Product, quantity=1):
-        product_id = str(product.id)
-        if product_id not in self.cart:
-            self.cart[product_id] = {'quantity': 0, 'price': product.price}
-        
-        self.cart[product_id]['quantity'] += quantity
-        self.save()
+    @property
+    def cart(self):
+        return self.storage.items()
 
-    def save(self):
-        self.session.modified = True
+    def add(self, product: Product, quantity=1):
+        self.storage.add(product.id, quantity, product.price)
+        self._snapshot = None
 
     def remove(self, product: Product):
-        product_id = str(product.id)
-        if product_id in self.cart:
-            del self.cart[product_id]
-            self.save()
+        self.storage.remove(product.id)
+        self._snapshot = None
+
+    def snapshot(self)->CartSnapshot:
+        r"""
+        Cart items joined with live product rows, loaded with one query and memoized
+        on this instance. Items use the live price, `price_changed`/`out_of_stock`
+        flag drift against the price stored when added and the current stock
+        """
+        if self._snapshot is not None:
+            return self._snapshot
+
+        stored_items = self.cart
+        products = Product.objects.only(*CART_PRODUCT_FIELDS).in_bulk(
+            [int(product_id) for product_id in stored_items]
+        )
+
+        items = []
+        missing_product_ids = []
+        for product_id, stored in stored_items.items():
+            product = products.get(int(product_id))
+            if product is None:
+                missing_product_ids.append(int(product_id))
+                continue
+
+            price = Decimal(product.price)
+            items.append(CartItem(
+                quantity=stored['quantity'],
+                price=price,
+                product=product,
+                total_price=price * stored['quantity'],
+                added_price=Decimal(stored['price']),
+                price_changed=product.price != stored['price'],
+                out_of_stock=product.stock < stored['quantity'],
+            ))
+
+        self._snapshot = CartSnapshot(
+            items=items,
+            total_price=sum((item['total_price'] for item in items), Decimal(0)),
+            missing_product_ids=missing_product_ids,
+            has_drift=bool(missing_product_ids) or any(
+                item['price_changed'] or item['out_of_stock'] for item in items
+            ),
+        )
+        return self._snapshot
+
+    def accept_snapshot(self):
+        r"""
+        Bring the stored cart in line with the current snapshot after the user was shown
+        the drift: drop products which no longer exist or are sold out, clamp quantities
+        to the current stock and store the live price of changed items
+        """
+        snapshot = self.snapshot()
+        for product_id in snapshot['missing_product_ids']:
+            self.storage.remove(product_id)
+
+        for item in snapshot['items']:
+            if not (item['price_changed'] or item['out_of_stock']):
+                continue
+
+            product = item['product']
+            self.storage.remove(product.id)
+            quantity = min(item['quantity'], product.stock)
+            if quantity > 0:
+                self.storage.add(product.id, quantity, product.price)
+
+        self._snapshot = None
 
     def __iter__(self)-> Iterator[CartItem]:
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
-        cart = self.cart.copy()
-        for product in products:
-            cart[str(product.id)]['product'] = product
-        
-        for item in cart.values():
-            item['price'] = Decimal(item['price'])
-            item['total_price'] = item['price'] * item['quantity']
-            yield item
+        return iter(self.snapshot()['items'])
 
     def __len__(self):
-        return sum(item['quantity'] for item in self.cart.values())
+        # maintained by the storage, no walk over the items
+        return self.storage.count()
 
-    def get_total_price(self):
-        return sum(Decimal(item['price']) * item['quantity'] for item in self.cart.values())
+    def get_total_price(self)->Decimal:
+        r"""Total with live product prices"""
+        return self.snapshot()['total_price']
 
     def clear(self):
-        del self.session[settings.CART_SESSION_ID]
-        self.save()
+        self.storage.clear()
+        self._snapshot = None
@@ -1,4 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
 from .cart import Cart
 
 def cart(request):
-    return {'cart': Cart(request)}
+    # built on first use only: anonymous pages never render the badge and skip the cart
+    # (and its redis lookup). The header still reads `user`, so the session is loaded anyway
+    return {'cart': SimpleLazyObject(lambda: Cart(request))}
@@ -0,0 +1,12 @@
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from carts.cart import Cart
+
+@receiver(user_logged_in)
+def migrate_session_cart_on_login(sender, request, user, **kwargs):
+    r"""
+    Signal handler to move a cart left in the session by `SessionCartStorage` into the user's cart
+    """
+    if request is not None:
+        Cart(request).storage.on_login()
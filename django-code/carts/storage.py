@@ -0,0 +1,184 @@
+from abc import ABC, abstractmethod
+from django.conf import settings
+from django.http import HttpRequest
+from django_redis import get_redis_connection
+from typing import TypedDict
+
+class StoredItem(TypedDict):
+    quantity: int
+    price: int
+
+class CartStorage(ABC):
+    r"""
+    Where `carts.cart.Cart` keeps its items, selected by `settings.CART_STORAGE_BACKEND`.
+    `items()` maps str(product_id) to a `StoredItem` and is read once per instance
+    """
+    def __init__(self, request: HttpRequest):
+        self.request = request
+
+    @abstractmethod
+    def items(self)->dict[str, StoredItem]:
+        ...
+
+    @abstractmethod
+    def add(self, product_id: int, quantity: int, price: int):
+        ...
+
+    @abstractmethod
+    def remove(self, product_id: int):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    def count(self)->int:
+        r"""Total quantity of all items"""
+        return sum(item['quantity'] for item in self.items().values())
+
+    def on_login(self):
+        r"""Called right after the request's user logged in"""
+        pass
+
+
+class SessionCartStorage(CartStorage):
+    r"""Items kept in the session, every write rewrites the whole session row"""
+    def __init__(self, request: HttpRequest):
+        super().__init__(request)
+        self.session = request.session
+
+    def items(self)->dict[str, StoredItem]:
+        cart = self.session.get(settings.CART_SESSION_ID)
+        if cart is None:
+            cart = self.session[settings.CART_SESSION_ID] = {}
+        return cart
+
+    def add(self, product_id: int, quantity: int, price: int):
+        cart = self.items()
+        item = cart.setdefault(str(product_id), {'quantity': 0, 'price': price})
+        item['quantity'] += quantity
+        self.session.modified = True
+
+    def remove(self, product_id: int):
+        cart = self.items()
+        if str(product_id) in cart:
+            del cart[str(product_id)]
+            self.session.modified = True
+
+    def clear(self):
+        self.session.pop(settings.CART_SESSION_ID, None)
+        self.session.modified = True
+
+
+# add quantity of a product, keep the first price, maintain item count
+_ADD_SCRIPT = """
+redis.call('HSETNX', KEYS[1], ARGV[1] .. ':price', ARGV[3])
+redis.call('HINCRBY', KEYS[1], ARGV[1] .. ':quantity', ARGV[2])
+redis.call('HINCRBY', KEYS[1], '__count__', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+"""
+
+# drop a product and take its quantity out of the maintained count
+_REMOVE_SCRIPT = """
+local quantity = redis.call('HGET', KEYS[1], ARGV[1] .. ':quantity')
+redis.call('HDEL', KEYS[1], ARGV[1] .. ':quantity', ARGV[1] .. ':price')
+if quantity then
+    redis.call('HINCRBY', KEYS[1], '__count__', -tonumber(quantity))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+"""
+
+class RedisCartStorage(CartStorage):
+    r"""
+    One redis hash per cart (`carts:<owner>`) with `<product_id>:quantity` and
+    `<product_id>:price` fields plus a maintained `__count__`.
+    Writes are atomic scripts, never touch the session, and refresh a TTL of `SESSION_COOKIE_AGE`.
+    The header badge is a single HGET of `__count__`.
+
+    Carts belong to signed in users (`carts:user:<pk>`, the cart views require login) and
+    are kept on purpose across logout and devices. Carts left in the session by
+    `SessionCartStorage` are moved here at login or on the first read of the items
+    """
+    KEY = 'carts:{owner}'
+    COUNT_FIELD = '__count__'
+
+    def __init__(self, request: HttpRequest):
+        super().__init__(request)
+        self._redis = get_redis_connection('default')
+        self._add_script = self._redis.register_script(_ADD_SCRIPT)
+        self._remove_script = self._redis.register_script(_REMOVE_SCRIPT)
+        self._items = None
+        self._count = None
+
+    def _key(self)->str | None:
+        user = self.request.user
+        return self.KEY.format(owner=f'user:{user.pk}') if user.is_authenticated else None
+
+    def _migrate_session_cart(self):
+        r"""Move a cart stored by `SessionCartStorage` into redis"""
+        key = self._key()
+        session_cart = self.request.session.get(settings.CART_SESSION_ID) if key is not None else None
+        if not session_cart:
+            return
+
+        for product_id, item in session_cart.items():
+            self._add_script(
+                keys=[key],
+                args=[product_id, item['quantity'], item['price'], settings.SESSION_COOKIE_AGE]
+            )
+        self.request.session.pop(settings.CART_SESSION_ID, None)
+        self._items = self._count = None
+
+    def on_login(self):
+        self._migrate_session_cart()
+
+    def items(self)->dict[str, StoredItem]:
+        if self._items is None:
+            # the header badge (`count`) never reads the session, the cart page does once
+            self._migrate_session_cart()
+            key = self._key()
+            raw = self._redis.hgetall(key) if key is not None else {}
+            self._items = self._parse(raw)
+        return self._items
+
+    @staticmethod
+    def _parse(raw: dict[bytes, bytes])->dict[str, StoredItem]:
+        items = {}
+        for field, value in raw.items():
+            # `__count__` has no ':' and is skipped here
+            product_id, _, attr = field.decode().partition(':')
+            if attr in ('quantity', 'price'):
+                items.setdefault(product_id, {'quantity': 0, 'price': 0})[attr] = int(value)
+
+        return {product_id: item for product_id, item in items.items() if item['quantity'] > 0}
+
+    def add(self, product_id: int, quantity: int, price: int):
+        # price is fixed when the product first enters the cart
+        self._add_script(
+            keys=[self._key()],
+            args=[product_id, quantity, price, settings.SESSION_COOKIE_AGE]
+        )
+        self._items = self._count = None
+
+    def remove(self, product_id: int):
+        key = self._key()
+        if key is None:
+            return
+        self._remove_script(keys=[key], args=[product_id, settings.SESSION_COOKIE_AGE])
+        self._items = self._count = None
+
+    def clear(self):
+        key = self._key()
+        if key is not None:
+            self._redis.delete(key)
+        self._items = {}
+        self._count = 0
+
+    def count(self)->int:
+        if self._count is None:
+            if self._items is not None:
+                self._count = super().count()
+            else:
+                key = self._key()
+                self._count = int(self._redis.hget(key, self.COUNT_FIELD) or 0) if key is not None else 0
+        return self._count
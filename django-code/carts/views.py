@@ -8,6 +8,7 @@ from django.views.decorators.cache import cache_control
 TEMPLATE_FOLDER_NAME = 'carts'
 
 from orders.forms import OrderForm
+from orders.idempotency import new_checkout_token
 from carts.cart import Cart
 from products.models import Product
 
@@ -30,4 +31,8 @@ def cart_remove(request: HttpRequest, product_id):
 @cache_control(no_cache=True, must_revalidate=True, no_store=True)
 def cart_detail(request: HttpRequest):
     cart = Cart(request)
-    return render(request, f'{TEMPLATE_FOLDER_NAME}/cart.html', {'cart': cart, 'form': OrderForm()})
+    return render(
+        request, 
+        f'{TEMPLATE_FOLDER_NAME}/cart.html', 
+        {'cart': cart, 'form': OrderForm(), 'checkout_token': new_checkout_token()}
+    )
@@ -1,17 +1,13 @@
 #!/bin/sh
 
 #### RUN collect static files into shared volume ####
-# local output static files in settings.py
-SOURCE_PATH="/app/staticfiles"
-# target path to be shared with nginx
-DEST_PATH="/vol/web/static"
+# collect straight into the path shared with nginx (STATIC_ROOT in settings.py),
+# collectstatic skips unchanged sources and existing hashed/compressed files
+export STATIC_ROOT="/vol/web/static"
 
-echo "Collecting static files to local path ($SOURCE_PATH)..."
+echo "Collecting static files to mounted volume ($STATIC_ROOT)..."
 python manage.py collectstatic --noinput
 
-echo "Copying static files from $SOURCE_PATH to mounted volume $DEST_PATH..."
-cp -rv "$SOURCE_PATH"/* "$DEST_PATH"
-
 #### RUN migrations ####
 echo "Running database migrations..."
 python manage.py migrate --verbosity 3
@@ -43,5 +39,8 @@ python manage.py createsuperuser \
     --email "$ADMIN_EMAIL"
 
 #### RUN start server ####
+# reviews are scored by celery workers, the web process never loads the sentiment model
+export SENTIMENT_MODEL_DISABLED=1
+
 echo "Starting uvicorn server..."
 exec uvicorn mysite.asgi:application --host 0.0.0.0 --port 8000
\ No newline at end of file
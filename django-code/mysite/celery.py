@@ -1,5 +1,7 @@
 import os
 from celery import Celery
+from celery.signals import worker_init
+from celery.schedules import crontab
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -19,6 +21,35 @@ class CelerySettings:
     result_serializer=os.environ['RESULT_SERIALIZER']
     timezone=os.environ['TIMEZONE']
     worker_concurrency=int(os.environ['WORKER_CONCURRENCY'])
+    beat_schedule={
+        # repair drift of the incremental review counters on Product
+        'reconcile-product-ratings': {
+            'task': 'reviews.tasks.reconcile_product_ratings_task',
+            'schedule': crontab(minute=30, hour=3),
+        },
+        # drain pending review ids whose scheduled flush was lost
+        'flush-pending-reviews': {
+            'task': 'reviews.tasks.flush_pending_reviews',
+            'schedule': crontab(),
+        },
+        # unscored reviews dropped from the batch path
+        'sweep-unscored-reviews': {
+            'task': 'reviews.tasks.sweep_unscored_reviews',
+            'schedule': crontab(minute='*/10'),
+        },
+        # orders whose post-checkout task was never enqueued or got lost
+        'requeue-pending-orders': {
+            'task': 'orders.tasks.requeue_pending_orders',
+            'schedule': crontab(minute='*/5'),
+        },
+    }
 
 app.config_from_object(CelerySettings)
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+
+@worker_init.connect
+def preload_sentiment_model(**kwargs):
+    # worker_init runs in the parent process, before the prefork pool starts its children
+    from reviews.ml_service import preload_predictor_instance
+    preload_predictor_instance()
@@ -70,6 +70,8 @@ TEMPLATES = [
 
 from csp.constants import SELF, NONCE
 
+# external assets are allowed by URL, not nonce: the nonce is only emitted when a template
+# reads CSP_NONCE (signed in pages), anonymous pages stay identical and shared cacheable
 CONTENT_SECURITY_POLICY = {
     "EXCLUDE_URL_PREFIXES": ["/admin"],
     "DIRECTIVES": {
@@ -140,9 +142,20 @@ USE_TZ = True
 USE_THOUSAND_SEPARATOR = True
 NUMBER_GROUPING = 3
 
-STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# entrypoint.sh points this at the volume shared with nginx
+STATIC_ROOT = os.environ.get('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
 STATIC_URL = 'static/'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    # content hashed names + precompressed .gz/.br, served immutable by nginx
+    'staticfiles': {
+        'BACKEND': 'mysite.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # this is for global scope static files
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'), 
@@ -159,9 +172,12 @@ STATICFILES_FINDERS = [
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Session Configuration
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# reads come from redis, mysql is only written when the session itself changes (login, messages)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 SESSION_COOKIE_AGE = 1209600 # 2 weeks
 CART_SESSION_ID = 'cart'
+# carts live in a redis hash per user, `carts.storage.SessionCartStorage` keeps them in the session
+CART_STORAGE_BACKEND = 'carts.storage.RedisCartStorage'
 
 
 CACHES = {
@@ -0,0 +1,47 @@
+import gzip
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    # optional, only gzip siblings are written without it
+    brotli = None
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    r"""
+    Content hashed filenames (`styles.3f2a9c1b7d4e.css`) plus precompressed `.gz`/`.br`
+    siblings of text assets, so the gateway serves them with `gzip_static` and never
+    compresses on the fly. Hashed files and their siblings already on disk are left
+    untouched, a collectstatic run only writes what changed
+    """
+    compressible_extensions = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+    min_compress_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(paths, dry_run=dry_run, **options):
+            if not dry_run and hashed_name and not isinstance(processed, Exception):
+                self._write_compressed(hashed_name)
+            yield name, hashed_name, processed
+
+    def _write_compressed(self, name: str):
+        if not name.endswith(self.compressible_extensions):
+            return
+
+        compressors = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            compressors.append(('.br', lambda data: brotli.compress(data)))
+
+        pending = [(suffix, compress) for suffix, compress in compressors if not self.exists(name + suffix)]
+        if not pending:
+            return
+
+        with self.open(name) as f:
+            data = f.read()
+        if len(data) < self.min_compress_size:
+            return
+
+        for suffix, compress in pending:
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                self._save(name + suffix, ContentFile(compressed))
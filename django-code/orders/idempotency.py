@@ -0,0 +1,32 @@
+import uuid
+from django.core.cache import cache
+
+CHECKOUT_TOKEN_KEY = 'orders:checkout_token:{user_id}:{token}'
+CHECKOUT_TOKEN_TIMEOUT = 60 * 60 * 24
+_PENDING = 'pending'
+
+def new_checkout_token()->str:
+    r"""Idempotency key rendered into the checkout form, one per cart page view"""
+    return uuid.uuid4().hex
+
+def claim_checkout_token(user_id, token: str)->tuple[bool, int | None]:
+    r"""
+    Atomically claim `token` for one checkout attempt (redis SET NX).
+    Returns (True, None) for the first submit, (False, order_id) for a replay of a
+    finished checkout and (False, None) while the first submit is still running
+    """
+    key = CHECKOUT_TOKEN_KEY.format(user_id=user_id, token=token)
+    if cache.add(key, _PENDING, timeout=CHECKOUT_TOKEN_TIMEOUT):
+        return True, None
+
+    value = cache.get(key)
+    return False, (value if value != _PENDING else None)
+
+def complete_checkout_token(user_id, token: str, order_id: int):
+    r"""Remember the order created for `token`, replays redirect to it"""
+    key = CHECKOUT_TOKEN_KEY.format(user_id=user_id, token=token)
+    cache.set(key, order_id, timeout=CHECKOUT_TOKEN_TIMEOUT)
+
+def release_checkout_token(user_id, token: str):
+    r"""Forget a failed attempt so the same form can be submitted again"""
+    cache.delete(CHECKOUT_TOKEN_KEY.format(user_id=user_id, token=token))
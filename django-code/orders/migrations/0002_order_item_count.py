@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:10
+
+from django.apps.registry import Apps
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from orders.models import Order as OrderModel
+
+def fill_item_count(apps: Apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Order: OrderModel = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+
+    # one UPDATE ... SET item_count = (SELECT SUM(quantity) ...) over all orders
+    item_count = (
+        OrderItem.objects.using(db_alias)
+        .filter(order_id=OuterRef('pk'))
+        .values('order_id')
+        .annotate(total=Sum('quantity'))
+        .values('total')
+    )
+    Order.objects.using(db_alias).update(item_count=Coalesce(Subquery(item_count), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_item_count, migrations.RunPython.noop),
+    ]
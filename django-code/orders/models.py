@@ -24,12 +24,18 @@ class Order(models.Model):
         default='PENDING'
     )
     total_cost = models.IntegerField()
+    # total quantity of items, written at checkout so listings never touch OrderItem
+    item_count = models.PositiveIntegerField(default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # order history: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['user', '-created_at'], name='orders_user_created_idx'),
+        ]
 
     def __str__(self):
         return f'Order {self.id}'
@@ -39,6 +45,12 @@ class OrderItem(models.Model):
     product = models.ForeignKey(Product, related_name='order_items', on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        indexes = [
+            # purchased products of a user: join from the user's orders reads product ids from the index only
+            models.Index(fields=['order', 'product'], name='orders_item_order_prod_idx'),
+        ]
+
     def __str__(self):
         return str(self.id)
 
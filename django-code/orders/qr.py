@@ -0,0 +1,40 @@
+import hashlib
+from django.core.cache import cache
+
+from orders.utils import render_qr_png
+
+# content addressed: the digest of the encoded payload names both entries,
+# the same payload always maps to the same image and never needs invalidation
+QR_PAYLOAD_KEY = 'orders:qr:payload:{digest}'
+QR_IMAGE_KEY = 'orders:qr:png:{digest}'
+QR_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+def qr_digest(payload: str)->str:
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def register_qr_payload(payload: str)->str:
+    r"""
+    Remember the payload for its digest so the image endpoint can render it later,
+    returns the digest used in the image url
+    """
+    digest = qr_digest(payload)
+    cache.add(QR_PAYLOAD_KEY.format(digest=digest), payload, timeout=QR_CACHE_TIMEOUT)
+    return digest
+
+def get_qr_png(digest: str)->bytes | None:
+    r"""
+    PNG bytes for a registered digest, rendered once and then served from the cache.
+    Returns None when the digest is unknown (never registered or expired)
+    """
+    image_key = QR_IMAGE_KEY.format(digest=digest)
+    png = cache.get(image_key)
+    if png is not None:
+        return png
+
+    payload = cache.get(QR_PAYLOAD_KEY.format(digest=digest))
+    if payload is None:
+        return None
+
+    png = render_qr_png(payload)
+    cache.set(image_key, png, timeout=QR_CACHE_TIMEOUT)
+    return png
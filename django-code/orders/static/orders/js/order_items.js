@@ -0,0 +1,41 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const orderDetailModal = document.getElementById('orderDetailModal');
+    if (!orderDetailModal) {
+        return;
+    }
+
+    const modalTitle = document.getElementById('orderDetailModalLabel');
+    const modalBody = document.getElementById('orderDetailModalBody');
+    // fragments already fetched in this page, keyed by order id
+    const loadedFragments = {};
+
+    orderDetailModal.addEventListener('show.bs.modal', function(event) {
+        const button = event.relatedTarget;
+        const orderId = button.dataset.orderId;
+
+        modalTitle.textContent = `Order #${orderId} Details`;
+
+        if (loadedFragments[orderId]) {
+            modalBody.innerHTML = loadedFragments[orderId];
+            return;
+        }
+
+        modalBody.innerHTML = '<div class="text-center text-muted p-4">Loading...</div>';
+        fetch(button.dataset.itemsUrl, { credentials: 'same-origin' })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.text();
+            })
+            .then(html => {
+                loadedFragments[orderId] = html;
+                modalBody.innerHTML = html;
+            })
+            .catch(error => {
+                console.error(error);
+                modalBody.innerHTML = '<div class="alert alert-danger">Could not load order items.</div>';
+            });
+    });
+
+});
@@ -0,0 +1,32 @@
+from django.db.models import F
+
+from products.models import Product
+
+class StockReservationError(ValueError):
+    r"""Raised with every product whose stock could not cover the requested quantity"""
+    def __init__(self, failed: dict[int, int]):
+        # product_id -> requested quantity
+        self.failed = failed
+        super().__init__(f"Not enough stock for products {sorted(failed)}")
+
+def reserve_stock(quantities: dict[int, int]):
+    r"""
+    Decrement stock for every (product_id, quantity) with one conditional
+    `UPDATE ... SET stock = stock - q WHERE id = ? AND stock >= q` per product.
+    No read-check-write window, so concurrent checkouts can't oversell, and rows are
+    locked in ascending id order so two checkouts never wait on each other in a cycle.
+
+    Must run inside `transaction.atomic()`: on StockReservationError the caller's
+    rollback releases the rows already decremented
+    """
+    failed = {}
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        updated = Product.objects.filter(id=product_id, stock__gte=quantity).update(
+            stock=F('stock') - quantity
+        )
+        if not updated:
+            failed[product_id] = quantity
+
+    if failed:
+        raise StockReservationError(failed)
@@ -0,0 +1,72 @@
+from celery import shared_task
+from datetime import timedelta
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from orders.models import Order
+
+ORDER_STATS_KEY = 'orders:stats:{day}'
+ORDER_STATS_TIMEOUT = 60 * 60 * 24 * 90
+# orders still PENDING after this were never processed (lost enqueue or task)
+PENDING_ORDER_REQUEUE_AFTER = timedelta(minutes=10)
+PENDING_ORDER_REQUEUE_LIMIT = 500
+
+@shared_task
+def process_order_payment(order_id: int):
+    """
+    Worker action: moves a freshly committed order out of PENDING,
+    then calls the next task for the post-payment work.
+    """
+    # make as success for demo purpose only,
+    # conditional so a redelivered task never flips a FAILED order
+    updated = Order.objects.filter(pk=order_id, payment_status='PENDING').update(
+        payment_status='SUCCESS',
+        updated_at=timezone.now()
+    )
+    if not updated:
+        print(f"Order with ID {order_id} not found or already processed.")
+        return
+
+    record_order_analytics.delay(order_id)
+
+
+@shared_task
+def record_order_analytics(order_id: int):
+    """
+    Worker action: adds the order to the per-day counters (orders, revenue, items).
+    """
+    try:
+        order = Order.objects.only('id', 'total_cost', 'created_at').get(pk=order_id)
+    except Order.DoesNotExist:
+        print(f"Order with ID {order_id} not found.")
+        return
+
+    item_quantities = order.items.values_list('quantity', flat=True)
+
+    key = ORDER_STATS_KEY.format(day=order.created_at.date().isoformat())
+    redis = get_redis_connection('default')
+    pipe = redis.pipeline(transaction=True)
+    pipe.hincrby(key, 'orders', 1)
+    pipe.hincrby(key, 'revenue', order.total_cost)
+    pipe.hincrby(key, 'items', sum(item_quantities))
+    pipe.expire(key, ORDER_STATS_TIMEOUT)
+    pipe.execute()
+
+
+@shared_task
+def requeue_pending_orders():
+    """
+    Periodic action: enqueues payment processing again for orders left PENDING,
+    e.g. when the broker was unreachable right after checkout committed.
+    """
+    order_ids = list(
+        Order.objects.filter(
+            payment_status='PENDING',
+            created_at__lt=timezone.now() - PENDING_ORDER_REQUEUE_AFTER
+        ).order_by('created_at').values_list('id', flat=True)[:PENDING_ORDER_REQUEUE_LIMIT]
+    )
+    for order_id in order_ids:
+        process_order_payment.delay(order_id)
+
+    if order_ids:
+        print(f"Re-enqueued {len(order_ids)} pending orders.")
@@ -1,11 +1,13 @@
 from django.urls import path
 
-from orders.views import checkout, order_complete, order_history
+from orders.views import checkout, order_complete, order_history, order_items, qr_image
 
 app_name = 'orders'
 
 urlpatterns = [
     path('checkout', checkout, name='checkout'),
     path('order-complete/<int:order_id>', order_complete, name='order_complete'),
-    path('order-history', order_history, name='order_history')
+    path('order-history', order_history, name='order_history'),
+    path('order-history/<int:order_id>/items', order_items, name='order_items'),
+    path('qr/<str:digest>.png', qr_image, name='qr_image')
 ]
@@ -1,10 +1,15 @@
 import qrcode
-import base64
 from io import BytesIO
+from django.core.cache import cache
 
-def generate_qr_code(url: str)->str:
+from orders.models import OrderItem
+
+PURCHASED_PRODUCTS_KEY = 'orders:purchased_products:{user_id}'
+PURCHASED_PRODUCTS_TIMEOUT = 60 * 60 * 24
+
+def render_qr_png(url: str)->bytes:
     """
-    Generates a QR code for the given URL and returns it as a Base64 encoded PNG string.
+    Generates a QR code for the given URL and returns the PNG bytes.
     """
     qr = qrcode.QRCode(
         version=1,
@@ -20,9 +25,22 @@ def generate_qr_code(url: str)->str:
     # Save image to a memory buffer
     buffer = BytesIO()
     img.save(buffer, format="PNG")
-    
-    # Encode the image data to Base64
-    qr_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    
-    # Return the data URI string
-    return f"data:image/png;base64,{qr_base64}"
+    return buffer.getvalue()
+
+def get_purchased_product_ids(user_id)->set[int]:
+    r"""
+    Ids of every product the user has ordered, cached per user.
+    Answers "may this user review product X" with a set lookup instead of an Order/OrderItem join
+    """
+    cache_key = PURCHASED_PRODUCTS_KEY.format(user_id=user_id)
+    product_ids = cache.get(cache_key)
+    if product_ids is None:
+        product_ids = set(
+            OrderItem.objects.filter(order__user_id=user_id).values_list('product_id', flat=True).distinct()
+        )
+        cache.set(cache_key, product_ids, timeout=PURCHASED_PRODUCTS_TIMEOUT)
+
+    return product_ids
+
+def invalidate_purchased_product_ids(user_id):
+    cache.delete(PURCHASED_PRODUCTS_KEY.format(user_id=user_id))
@@ -1,8 +1,9 @@
 from django.shortcuts import render, redirect
 from django.views.decorators.http import require_POST
-from django.http import HttpRequest
+from django.http import HttpRequest, HttpResponse, Http404
 from django.contrib import messages
 from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
 from urllib.parse import urlencode
@@ -10,17 +11,53 @@ from urllib.parse import urlencode
 from orders.models import Order, OrderItem
 from carts.cart import Cart
 from orders.forms import OrderForm
-from orders.utils import generate_qr_code
+from orders.stock import reserve_stock, StockReservationError
+from orders.idempotency import claim_checkout_token, complete_checkout_token, release_checkout_token
+from orders.tasks import process_order_payment
+from orders.utils import invalidate_purchased_product_ids
+from orders.qr import register_qr_payload, get_qr_png
+from products.pagination import CursorPaginator
 
 TEMPLATE_FOLDER_NAME = 'orders'
+# qr images are content addressed, a digest url never changes its bytes
+QR_IMAGE_MAX_AGE = 60 * 60 * 24 * 7
+ORDER_HISTORY_PAGE_SIZE = 20
+# columns of the history table, items are summarized by `item_count`
+ORDER_HISTORY_FIELDS = ('id', 'created_at', 'total_cost', 'payment_status', 'item_count')
 
 @require_POST
 @cache_control(no_cache=True, must_revalidate=True, no_store=True)
 def checkout(request: HttpRequest):
+    # double clicks and gateway retries replay the same token, answer them
+    # from redis before touching the cart or mysql
+    checkout_token = request.POST.get('checkout_token')
+    if not checkout_token:
+        messages.error(request, "Please correct the errors in the form.")
+        return redirect(f'carts:cart_detail')
+
+    user_id = request.user.pk
+    claimed, previous_order_id = claim_checkout_token(user_id, checkout_token)
+    if not claimed:
+        if previous_order_id is not None:
+            return redirect(f'{TEMPLATE_FOLDER_NAME}:order_complete', order_id = previous_order_id)
+        # the first submit is still running: its order shows up in the history,
+        # the cart would invite yet another submit
+        messages.info(request, "Đơn hàng đang được xử lý")
+        return redirect(f'{TEMPLATE_FOLDER_NAME}:order_history')
+
     cart = Cart(request)
     form = OrderForm(request.POST)
 
     if form.is_valid():
+        # never place an order different from the cart the user saw: removed products,
+        # changed prices or missing stock send them back to the updated cart
+        cart_snapshot = cart.snapshot()
+        if cart_snapshot['has_drift']:
+            release_checkout_token(user_id, checkout_token)
+            cart.accept_snapshot()
+            messages.warning(request, "Giỏ hàng đã được cập nhật theo giá và tồn kho hiện tại, vui lòng kiểm tra lại trước khi đặt hàng.")
+            return redirect(f'carts:cart_detail')
+
         try:
             with transaction.atomic():
                 order: Order = form.save(commit=False)
@@ -29,57 +66,71 @@ def checkout(request: HttpRequest):
                 if request.user.is_authenticated:
                     order.user = request.user
                 
-                order.total_cost = cart.get_total_price()
+                # products were loaded once (snapshot above) for the total and the items.
+                # reserve first: conditional decrements lock product rows in id order,
+                # the FK checks of the item inserts below then hit rows we already hold
+                reserve_stock({
+                    item['product'].id: item['quantity']
+                    for item in cart_snapshot['items']
+                })
+
+                order.total_cost = cart_snapshot['total_price']
+                order.item_count = sum(item['quantity'] for item in cart_snapshot['items'])
                 order.save()
                 
-                order_items_to_commit = []
-                for item in cart:
-                    product = item['product']
-                    quantity = item['quantity']
-                    
-                    # Stock check
-                    if product.stock < quantity:
-                        raise ValueError(f"Not enough stock for {product.name}.")
-                    
-
-                    order_items_to_commit.append(
-                        OrderItem(
-                            order=order,
-                            product=product,
-                            quantity=quantity
-                    ))
-                    
-                    # Deduct stock immediately
-                    product.stock -= quantity
-                    product.save()
-                
-                OrderItem.objects.bulk_create(order_items_to_commit) 
-                
-                # Clear cart and success message
-                cart.clear()
-                
-                # make as success for demo purpose only
-                order.payment_status = 'SUCCESS'
-                order.save()
-
-                return redirect(f'{TEMPLATE_FOLDER_NAME}:order_complete', order_id = order.id)
+                OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order=order,
+                        product=item['product'],
+                        quantity=item['quantity']
+                    )
+                    for item in cart_snapshot['items']
+                ])
+
+                # everything else runs once the order row is committed:
+                # new purchases change which products the user may review,
+                # payment status and analytics are processed by celery.
+                # robust: a failing hook (broker down) is logged, the order stays placed
+                # and PENDING orders are re-enqueued by `requeue_pending_orders`
+                order_user_id, order_id = order.user_id, order.id
+                transaction.on_commit(lambda: invalidate_purchased_product_ids(order_user_id), robust=True)
+                transaction.on_commit(lambda: complete_checkout_token(user_id, checkout_token, order_id), robust=True)
+                transaction.on_commit(cart.clear, robust=True)
+                transaction.on_commit(lambda: process_order_payment.delay(order_id), robust=True)
+
+            return redirect(f'{TEMPLATE_FOLDER_NAME}:order_complete', order_id = order.id)
+
+        except StockReservationError as e:
+            # Handle out-of-stock, name every product which failed
+            print(e)
+            release_checkout_token(user_id, checkout_token)
+            product_names = {item['product'].id: item['product'].name for item in cart.snapshot()['items']}
+            failed_names = ', '.join(product_names.get(product_id, str(product_id)) for product_id in sorted(e.failed))
+            messages.error(request, f"Order failed: Not enough stock for {failed_names}.")
+            return redirect(f'carts:cart_detail')
 
         except ValueError as e:
-            # Handle out-of-stock
             print(e)
+            release_checkout_token(user_id, checkout_token)
             messages.error(request, f"Order failed: {e}")
             return redirect(f'carts:cart_detail')
 
         except Exception as e:
             print(e)
+            release_checkout_token(user_id, checkout_token)
             # Handle general database/server errors
             messages.error(request, "An unexpected error occurred during checkout.")
             return redirect(f'carts:cart_detail')
     
     # the form is NOT valid
     else:
+        release_checkout_token(user_id, checkout_token)
         messages.error(request, "Please correct the errors in the form.")
-        return render(request, f'carts/cart.html', {'form': form, 'cart': cart})
+        return render(
+            request, 
+            f'carts/cart.html', 
+            {'form': form, 'cart': cart, 'checkout_token': checkout_token}
+        )
 
 
 @login_required(login_url='/login/')
@@ -100,35 +151,53 @@ def order_complete(request: HttpRequest, order_id: int):
         'orderId': order.id
     }
     payment_url = request.build_absolute_uri(f"/mobile/img?{urlencode(payment_info)}")
-    qr_data_uri = generate_qr_code(payment_url)
+    # the image itself is served (and rendered once) by `qr_image`
+    qr_digest = register_qr_payload(payment_url)
 
     return render(
         request, 
         f'{TEMPLATE_FOLDER_NAME}/order_created.html', 
         {
             'order': order,
-            'qr_data_uri': qr_data_uri
+            'qr_digest': qr_digest
         }
     )
 
 
+@login_required(login_url='/login/')
+@cache_control(private=True, max_age=QR_IMAGE_MAX_AGE, immutable=True)
+@condition(etag_func=lambda request, digest: digest)
+def qr_image(request: HttpRequest, digest: str):
+    r"""GET request for a payment QR code as PNG, addressed by the digest of its payload"""
+    png = get_qr_png(digest)
+    if png is None:
+        raise Http404("QR code not found")
+
+    return HttpResponse(png, content_type='image/png')
+
+
 @login_required
 def order_history(request: HttpRequest):
     """
-    Fetches all orders associated with the currently logged-in user.
-    Orders are retrieved in descending order of creation time.
+    Fetches the orders of the currently logged-in user, newest first,
+    one keyset page at a time. Rows are projected to the columns shown in the table
+    and items are loaded on demand by `order_items`.
     """
     try:
-        # Query the database for orders belonging to the current user (request.user)
-        # We use .select_related('user') to optimize the initial query
-        # and .prefetch_related('items__product') to efficiently load all related OrderItems and their Products
-        orders = Order.objects.filter(user=request.user).select_related('user').prefetch_related('items__product')
+        orders = Order.objects.filter(user=request.user).values(*ORDER_HISTORY_FIELDS)
+        page_obj = CursorPaginator(
+            orders,
+            ORDER_HISTORY_PAGE_SIZE,
+            ordering=('-created_at', '-id')
+        ).get_page(request.GET.get('cursor'))
 
         return render(
             request, 
             f'{TEMPLATE_FOLDER_NAME}/order_history.html', 
             {
-                'orders': orders,
+                'orders': page_obj.object_list,
+                'page_obj': page_obj,
+                'pagination_query': '',
                 'user': request.user
             }
         )
@@ -142,4 +211,30 @@ def order_history(request: HttpRequest):
                 'orders': [],
                 'error_message': 'Could not retrieve order history due to an internal error.'
             }
-        )
\ No newline at end of file
+        )
+
+
+@login_required
+def order_items(request: HttpRequest, order_id: int):
+    r"""GET request for the detail fragment of one order, shown in the history modal"""
+    order = Order.objects.filter(id=order_id, user=request.user).values(
+        'id', 'payment_status', 'total_cost', 'address', 'phone_number'
+    ).first()
+    if order is None:
+        raise Http404("Order not found")
+
+    items = OrderItem.objects.filter(order_id=order_id).values(
+        'quantity', 'product__name', 'product__price'
+    ).order_by('id')
+
+    return render(
+        request,
+        f'{TEMPLATE_FOLDER_NAME}/order_items.component.html',
+        {
+            'order': order,
+            'items': [
+                {**item, 'cost': (item['product__price'] or 0) * item['quantity']}
+                for item in items
+            ]
+        }
+    )
@@ -0,0 +1,55 @@
+import hashlib
+import json
+import uuid
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = 'products:catalog:version'
+LISTING_CACHE_KEY = 'products:listing:{version}:{digest}'
+LISTING_CACHE_TIMEOUT = 60 * 10
+
+def get_version(key: str, timeout: int | None = None)->str:
+    r"""
+    Version stamp stored under `key`, created on first read. Embedded in cache keys
+    so moving it (`bump_version`) invalidates all dependent entries at once
+    """
+    version = cache.get(key)
+    if version is None:
+        # another process may have set it first, `add` keeps the first writer's value
+        cache.add(key, uuid.uuid4().hex, timeout=timeout)
+        version = cache.get(key)
+
+    return version
+
+def bump_version(key: str, timeout: int | None = None):
+    cache.set(key, uuid.uuid4().hex, timeout=timeout)
+
+def get_catalog_version()->str:
+    r"""Version stamp of the whole catalog, moved by every Product/Category write"""
+    return get_version(CATALOG_VERSION_KEY)
+
+def bump_catalog_version():
+    bump_version(CATALOG_VERSION_KEY)
+
+def listing_cache_key(params: dict)->str:
+    r"""Cache key for a listing page from its normalized query params"""
+    digest = hashlib.sha256(
+        json.dumps(params, sort_keys=True, separators=(',', ':')).encode()
+    ).hexdigest()
+
+    return LISTING_CACHE_KEY.format(version=get_catalog_version(), digest=digest)
+
+PRODUCT_VERSION_KEY = 'products:product:{product_id}:version'
+PRODUCT_DETAIL_CACHE_KEY = 'products:detail:{product_id}:{version}'
+PRODUCT_DETAIL_CACHE_TIMEOUT = 60 * 30
+# losing a version stamp only costs a cache miss, keep unknown ids from piling up
+PRODUCT_VERSION_TIMEOUT = 60 * 60 * 24
+
+def get_product_version(product_id: int)->str:
+    r"""Version stamp of one product page, moved by writes to the product, its images or reviews"""
+    return get_version(PRODUCT_VERSION_KEY.format(product_id=product_id), timeout=PRODUCT_VERSION_TIMEOUT)
+
+def bump_product_version(product_id: int):
+    bump_version(PRODUCT_VERSION_KEY.format(product_id=product_id), timeout=PRODUCT_VERSION_TIMEOUT)
+
+def product_detail_cache_key(product_id: int)->str:
+    return PRODUCT_DETAIL_CACHE_KEY.format(product_id=product_id, version=get_product_version(product_id))
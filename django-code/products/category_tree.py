@@ -0,0 +1,79 @@
+from dataclasses import dataclass, field
+import threading
+from django.core.cache import cache
+
+from products.cache import get_version, bump_version
+from products.models import Category
+
+CATEGORY_TREE_VERSION_KEY = 'products:category_tree:version'
+CATEGORY_TREE_KEY = 'products:category_tree:{version}'
+# stale versions are never read again, let redis drop them
+CATEGORY_TREE_TIMEOUT = 60 * 60 * 24
+
+@dataclass
+class CategoryNode:
+    r"""Lightweight, db-free stand-in for `Category` used by the navigation menu"""
+    id: int
+    name: str
+    slug: str
+    parent_id: int | None
+    path: str
+    subcategories: list['CategoryNode'] = field(default_factory=list)
+
+    def __str__(self):
+        return self.name
+
+class CategoryTree(object):
+    r"""
+    Whole category hierarchy built from (id, name, slug, parent_id, path) rows,
+    roots with nested `subcategories` for the menu and id->node lookups
+    """
+    def __init__(self, rows: list[tuple[int, str, str, int | None, str]]):
+        # rows come ordered by name, so children lists keep that order
+        self._nodes: dict[int, CategoryNode] = {
+            _id: CategoryNode(_id, name, slug, parent_id, path)
+            for _id, name, slug, parent_id, path in rows
+        }
+        self.roots: list[CategoryNode] = []
+        for node in self._nodes.values():
+            parent = self._nodes.get(node.parent_id)
+            if parent is None:
+                self.roots.append(node)
+            else:
+                parent.subcategories.append(node)
+
+    def get(self, category_id: int)->CategoryNode | None:
+        return self._nodes.get(category_id)
+
+
+# per-process memo, only rebuilt when the shared version in redis moves
+_memo_lock = threading.Lock()
+_memo: dict = {'version': None, 'tree': None}
+
+def get_category_tree()->CategoryTree:
+    r"""
+    Category tree from the per-process memo, falling back to the redis copy and
+    only then to the db. Steady state cost is one redis GET for the version stamp
+    """
+    version = get_version(CATEGORY_TREE_VERSION_KEY)
+
+    with _memo_lock:
+        if _memo['version'] == version:
+            return _memo['tree']
+
+    key = CATEGORY_TREE_KEY.format(version=version)
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(Category.objects.order_by('name').values_list('id', 'name', 'slug', 'parent_id', 'path'))
+        cache.set(key, rows, timeout=CATEGORY_TREE_TIMEOUT)
+
+    tree = CategoryTree(rows)
+    with _memo_lock:
+        _memo['version'] = version
+        _memo['tree'] = tree
+
+    return tree
+
+def invalidate_category_tree():
+    r"""Move the version stamp, every process rebuilds on its next lookup"""
+    bump_version(CATEGORY_TREE_VERSION_KEY)
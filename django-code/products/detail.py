@@ -0,0 +1,54 @@
+from typing import TypedDict
+import datetime
+from django.core.cache import cache
+from django.db.models import Count, Max, F
+
+from products.models import Product
+from products.cache import product_detail_cache_key, PRODUCT_DETAIL_CACHE_TIMEOUT
+
+# reviews rendered on the detail page, newest first
+DETAIL_REVIEW_LIMIT = 20
+
+class ReviewItem(TypedDict):
+    username: str
+    content: str
+    created_at: datetime.datetime
+
+class ProductDetail(TypedDict):
+    product: Product
+    image_urls: list[str]
+    reviews: list[ReviewItem]
+    review_count: int
+    latest_review_at: datetime.datetime | None
+
+def load_product_detail(product_id: int)->ProductDetail:
+    r"""
+    Everything the product detail page renders, assembled with a fixed number of
+    queries (product, images, review aggregate, capped reviews) and cached by product version.
+    Raises Product.DoesNotExist
+    """
+    cache_key = product_detail_cache_key(product_id)
+    detail = cache.get(cache_key)
+    if detail is not None:
+        return detail
+
+    product = Product.objects.defer('search_document').get(id=product_id)
+
+    image_urls = list(
+        product.images.order_by('created_at').values_list('image_url', flat=True)
+    )
+    review_stats = product.reviews.aggregate(review_count=Count('id'), latest_review_at=Max('created_at'))
+    reviews = list(
+        product.reviews.order_by('-created_at')
+        .values('content', 'created_at', username=F('user__username'))[:DETAIL_REVIEW_LIMIT]
+    )
+
+    detail = ProductDetail(
+        product=product,
+        image_urls=image_urls,
+        reviews=reviews,
+        review_count=review_stats['review_count'],
+        latest_review_at=review_stats['latest_review_at'],
+    )
+    cache.set(cache_key, detail, timeout=PRODUCT_DETAIL_CACHE_TIMEOUT)
+    return detail
@@ -0,0 +1,138 @@
+import re
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, QuerySet
+
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+from products.utils import LISTING_FIELDS
+from reviews.models import Review
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot queries (order history, purchased products, reviews of a product, "
+        "category listing) with and without their composite index, and time both variants"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['traditional', 'tree', 'json'], default='traditional')
+        parser.add_argument('--analyze', action='store_true', help="EXPLAIN ANALYZE, executes the queries (MySQL 8.0.18+)")
+        parser.add_argument('--repeat', type=int, default=20, help="executions per variant for timing, 0 to skip")
+        parser.add_argument('--user-id', type=int, help="defaults to the user with most orders")
+        parser.add_argument('--product-id', type=int, help="defaults to the product with most reviews")
+        parser.add_argument('--category-id', type=int, help="defaults to the category with most products")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError(f"index hints are MySQL only, default database is {connection.vendor}")
+
+        user_id = options['user_id'] or self._most_frequent(Order.objects.all(), 'user_id')
+        product_id = options['product_id'] or self._most_frequent(Review.objects.all(), 'product_id')
+        category_id = options['category_id'] or self._most_frequent(Product.objects.all(), 'category_id')
+
+        hot_queries = []
+        if user_id is not None:
+            hot_queries += [
+                (
+                    'order history',
+                    Order.objects.filter(user_id=user_id)
+                    .values('id', 'created_at', 'total_cost', 'payment_status', 'item_count')
+                    .order_by('-created_at', '-id')[:21],
+                    Order._meta.db_table, 'orders_user_created_idx'
+                ),
+                (
+                    'purchased products',
+                    OrderItem.objects.filter(order__user_id=user_id).values_list('product_id', flat=True).distinct(),
+                    OrderItem._meta.db_table, 'orders_item_order_prod_idx'
+                ),
+            ]
+        if product_id is not None:
+            hot_queries += [
+                (
+                    'scored reviews of a product',
+                    Review.objects.filter(product_id=product_id, score__isnull=False).values_list('score', flat=True),
+                    Review._meta.db_table, 'reviews_product_score_idx'
+                ),
+                (
+                    'latest reviews of a product',
+                    Review.objects.filter(product_id=product_id).order_by('-created_at').values('content', 'created_at')[:20],
+                    Review._meta.db_table, 'reviews_product_created_idx'
+                ),
+            ]
+        if category_id is not None:
+            category = Category.objects.only('path').get(pk=category_id)
+            listing = Product.objects.filter(category__path__startswith=category.path).only(*LISTING_FIELDS)
+            prices = sorted(listing.values_list('price', flat=True)[:1000]) or [0]
+            hot_queries += [
+                (
+                    'category listing',
+                    listing.order_by('-created_at', '-id')[:13],
+                    Product._meta.db_table, 'products_cat_created_idx'
+                ),
+                (
+                    'category listing with price range',
+                    listing.filter(price__gte=prices[len(prices) // 4], price__lte=prices[len(prices) * 3 // 4])
+                    .order_by('-created_at', '-id')[:13],
+                    Product._meta.db_table, 'products_cat_price_idx'
+                ),
+            ]
+
+        if not hot_queries:
+            raise CommandError("no orders, reviews or products to explain")
+
+        for title, queryset, table, index_name in hot_queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {title} ({index_name})"))
+            sql, params = queryset.query.sql_with_params()
+            hinted_sql = self._ignore_index(sql, table, index_name)
+
+            for label, variant_sql in (('with index', sql), ('IGNORE INDEX', hinted_sql)):
+                self.stdout.write(self.style.HTTP_INFO(f"-- {label}"))
+                self.stdout.write(self._explain(variant_sql, params, options['format'], options['analyze']))
+                if options['repeat'] > 0:
+                    elapsed = self._time(variant_sql, params, options['repeat'])
+                    self.stdout.write(f"{options['repeat']} runs, {elapsed * 1000 / options['repeat']:.3f} ms/run")
+            self.stdout.write('')
+
+    @staticmethod
+    def _most_frequent(queryset: QuerySet, field: str):
+        return queryset.values(field).annotate(n=Count('pk')).order_by('-n').values_list(field, flat=True).first()
+
+    @staticmethod
+    def _ignore_index(sql: str, table: str, index_name: str)->str:
+        r"""Add `IGNORE INDEX` on the first reference of `table` in FROM / JOIN"""
+        hinted_sql, count = re.subn(
+            rf'((?:FROM|JOIN) `{re.escape(table)}`)',
+            rf'\1 IGNORE INDEX (`{index_name}`)',
+            sql,
+            count=1
+        )
+        if count == 0:
+            raise CommandError(f"table {table} not found in: {sql}")
+        return hinted_sql
+
+    @staticmethod
+    def _explain(sql: str, params: tuple, format: str, analyze: bool)->str:
+        prefix = 'EXPLAIN ANALYZE' if analyze else f'EXPLAIN FORMAT={format.upper()}'
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+
+        if len(columns) == 1:
+            # tree, json and analyze return a single text column
+            return '\n'.join(str(row[0]) for row in rows)
+
+        return '\n'.join(
+            ' | '.join(f'{column}={value}' for column, value in zip(columns, row) if value is not None)
+            for row in rows
+        )
+
+    @staticmethod
+    def _time(sql: str, params: tuple, repeat: int)->float:
+        with connection.cursor() as cursor:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                cursor.execute(sql, params)
+                cursor.fetchall()
+            return time.perf_counter() - start
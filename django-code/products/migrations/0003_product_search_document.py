@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:00
+
+from django.apps.registry import Apps
+from django.db import migrations, models
+
+from products.models import Product as ProductModel
+from products.search import build_search_document, FULLTEXT_INDEX_NAME
+
+BATCH_SIZE = 500
+
+def fill_search_document(apps: Apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Product: ProductModel = apps.get_model('products', 'Product')
+
+    # historical models don't run Product.save, build documents manually
+    batch = []
+    for product in Product.objects.using(db_alias).only('id', 'name', 'description').iterator(chunk_size=BATCH_SIZE):
+        product.search_document = build_search_document(product.name, product.description)
+        batch.append(product)
+
+        if len(batch) >= BATCH_SIZE:
+            Product.objects.using(db_alias).bulk_update(batch, ['search_document'])
+            batch = []
+
+    if batch:
+        Product.objects.using(db_alias).bulk_update(batch, ['search_document'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_insert_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_search_document, migrations.RunPython.noop),
+        # Django has no FULLTEXT index type, create it on MySQL directly
+        migrations.RunSQL(
+            sql=f'ALTER TABLE `products_product` ADD FULLTEXT INDEX `{FULLTEXT_INDEX_NAME}` (`search_document`)',
+            reverse_sql=f'ALTER TABLE `products_product` DROP INDEX `{FULLTEXT_INDEX_NAME}`',
+        ),
+    ]
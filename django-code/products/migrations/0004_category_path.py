@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:30
+
+from collections import defaultdict
+from django.apps.registry import Apps
+from django.db import migrations, models
+
+from products.models import Category as CategoryModel
+
+def fill_category_path(apps: Apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Category: CategoryModel = apps.get_model('products', 'Category')
+
+    categories = list(Category.objects.using(db_alias).only('id', 'parent_id'))
+    children_map = defaultdict(list)
+    for category in categories:
+        children_map[category.parent_id].append(category)
+
+    # walk from the roots, historical models don't run Category.save
+    stack = [(category, '') for category in children_map[None]]
+    while stack:
+        category, parent_path = stack.pop()
+        category.path = CategoryModel.build_path(parent_path, category.id)
+        category.depth = category.path.count('/') - 1
+        stack.extend((child, category.path) for child in children_map[category.id])
+
+    Category.objects.using(db_alias).bulk_update(categories, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_category_path, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:20
+
+from django.apps.registry import Apps
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
+
+from products.models import Product as ProductModel
+
+def fill_review_counters(apps: Apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Product: ProductModel = apps.get_model('products', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+
+    review_counts = (
+        Review.objects.using(db_alias)
+        .filter(product_id=OuterRef('pk'), score__isnull=False)
+        .values('product_id')
+        .annotate(
+            scored=Count('pk'),
+            positive=Count('pk', filter=Q(score=True))
+        )
+    )
+    products = Product.objects.using(db_alias)
+    products.update(
+        scored_review_count=Coalesce(Subquery(review_counts.values('scored')), Value(0)),
+        positive_review_count=Coalesce(Subquery(review_counts.values('positive')), Value(0))
+    )
+    products.filter(scored_review_count=0).update(mean_rating=None)
+    products.filter(scored_review_count__gt=0).update(
+        mean_rating=Cast('positive_review_count', FloatField()) / F('scored_review_count')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_products_cat_price_idx_and_more'),
+        ('reviews', '0002_review_reviews_product_score_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='scored_review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='positive_review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_review_counters, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 import uuid
 
 ################## Category and Product ##################
@@ -15,6 +17,13 @@ class Category(models.Model):
         related_name='children',
     )
 
+    # materialized path of zero padded ids from the root, e.g. '0000000001/0000000007/'.
+    # subtree of X at any depth is `path LIKE 'X.path%'`, a range scan on this index
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(editable=False, default=0)
+
+    PATH_STEP_WIDTH = 10
+
     class Meta:
         ordering = ['name']
         unique_together = ('slug', 'parent',) 
@@ -23,6 +32,35 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def build_path(cls, parent_path: str, category_id: int)->str:
+        return f'{parent_path}{category_id:0{cls.PATH_STEP_WIDTH}d}/'
+
+    def save(self, *args, **kwargs):
+        r"""
+        Save and keep `path`/`depth` in sync. A new row needs its id before the path
+        is known, a re-parented row also moves the paths of its whole subtree
+        """
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+            parent_path = self.parent.path if self.parent_id is not None else ''
+            new_path = self.build_path(parent_path, self.pk)
+            if new_path == self.path:
+                return
+
+            old_path, old_depth = self.path, self.depth
+            new_depth = new_path.count('/') - 1
+
+            Category.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+            if old_path:
+                Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + (new_depth - old_depth)
+                )
+
+            self.path, self.depth = new_path, new_depth
+
 class Product(models.Model):
     r"""
     Schema for product table
@@ -37,9 +75,39 @@ class Product(models.Model):
     is_active = models.BooleanField()
     thumbnail_url = models.URLField(null= False)
     mean_rating = models.FloatField(null= True, default=None)
+    # running counters of scored reviews, mean_rating = positive / scored (see reviews/utils.py)
+    scored_review_count = models.PositiveIntegerField(default=0, editable=False)
+    positive_review_count = models.PositiveIntegerField(default=0, editable=False)
+    # tokenized name + description, FULLTEXT indexed (see products/search.py)
+    search_document = models.TextField(blank=True, default='', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    SEARCH_SOURCE_FIELDS = frozenset({'name', 'description'})
+
+    class Meta:
+        indexes = [
+            # listing with price filter: WHERE category_id IN (...) AND price BETWEEN ? AND ?
+            models.Index(fields=['category', 'price'], name='products_cat_price_idx'),
+            # listing: WHERE category_id IN (...) ORDER BY created_at DESC, id DESC
+            models.Index(fields=['category', '-created_at'], name='products_cat_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        r"""
+        Keep `search_document` in sync with name/description. Partial saves
+        which don't touch those fields (stock, mean_rating) skip tokenization
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or self.SEARCH_SOURCE_FIELDS.intersection(update_fields):
+            from products.search import build_search_document
+            self.search_document = build_search_document(self.name, self.description)
+
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_document'}
+
+        super().save(*args, **kwargs)
+
 class ProductImg(models.Model):
     id = models.UUIDField(
         primary_key=True, 
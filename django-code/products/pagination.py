@@ -0,0 +1,130 @@
+import base64
+import binascii
+import datetime
+import json
+from django.core import signing
+from django.db.models import Q, QuerySet
+
+class CursorPage(object):
+    r"""
+    One page of a keyset pagination. Mirrors the parts of `django.core.paginator.Page`
+    used by templates (`object_list`, `has_next`, `has_previous`, ...) and exposes
+    opaque `next_cursor`, `previous_cursor` in place of page numbers
+    """
+    is_cursor = True
+
+    def __init__(self, object_list: list, next_cursor: str | None, previous_cursor: str | None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self)->bool:
+        return self.next_cursor is not None
+
+    def has_previous(self)->bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self)->bool:
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator(object):
+    r"""
+    Keyset (cursor) paginator. Each page is a single `WHERE (key) < (last key) ... LIMIT n+1`
+    query, there is no COUNT(*) and no OFFSET scan so page cost does not grow with depth.
+
+    `ordering` must end with a unique column (usually `id`) so that the key is total.
+    Fields may be model fields or annotations present on `queryset`.
+    """
+    _NEXT = 'n'
+    _PREVIOUS = 'p'
+    # cursors are signed, only keys this paginator issued are accepted
+    # (a forged cursor can't probe arbitrary keys or mint new cache entries)
+    _signer = signing.Signer(salt='products.pagination.cursor')
+
+    def __init__(self, queryset: QuerySet, per_page: int, ordering: tuple[str, ...] = ('-created_at', '-id')):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+
+    def get_page(self, cursor: str | None)->CursorPage:
+        r"""Return the page after/before `cursor`, the first page on missing or invalid cursor"""
+        direction, values = self.decode_cursor(cursor)
+
+        if direction == self._PREVIOUS:
+            queryset = self.queryset.filter(self._keyset_filter(values, forward=False))
+            queryset = queryset.order_by(*self._reversed_ordering())
+            rows = list(queryset[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next, has_previous = True, has_more
+
+        else:
+            queryset = self.queryset.order_by(*self.ordering)
+            if values is not None:
+                queryset = queryset.filter(self._keyset_filter(values, forward=True))
+            rows = list(queryset[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = values is not None
+
+        next_cursor = self.encode_cursor(self._NEXT, rows[-1]) if has_next and rows else None
+        previous_cursor = self.encode_cursor(self._PREVIOUS, rows[0]) if has_previous and rows else None
+
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+    def encode_cursor(self, direction: str, row)->str:
+        values = []
+        for field_name in self._field_names():
+            # rows are model instances or dicts from `.values()`
+            value = row[field_name] if isinstance(row, dict) else getattr(row, field_name)
+            if isinstance(value, (datetime.datetime, datetime.date)):
+                # keep full microsecond precision, the key must compare exactly
+                value = value.isoformat()
+            values.append(value)
+
+        payload = json.dumps([direction, values], separators=(',', ':'))
+        return self._signer.sign(base64.urlsafe_b64encode(payload.encode()).decode().rstrip('='))
+
+    def decode_cursor(self, cursor: str | None)->tuple[str | None, list | None]:
+        if not cursor:
+            return None, None
+        try:
+            cursor = self._signer.unsign(cursor)
+            payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(payload)
+            assert direction in (self._NEXT, self._PREVIOUS)
+            assert len(values) == len(self.ordering)
+            return direction, values
+
+        except (ValueError, TypeError, AssertionError, binascii.Error, signing.BadSignature):
+            return None, None
+
+    def _field_names(self)->list[str]:
+        return [field.lstrip('-') for field in self.ordering]
+
+    def _reversed_ordering(self)->list[str]:
+        return [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+
+    def _keyset_filter(self, values: list, forward: bool)->Q:
+        r"""
+        Lexicographic row comparison expanded into OR of AND terms:
+        (a < x) OR (a = x AND b < y) OR ...
+        """
+        condition = Q()
+        equal_terms = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+
+            condition |= Q(**equal_terms, **{f'{name}__{lookup}': value})
+            equal_terms[name] = value
+
+        return condition
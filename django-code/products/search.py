@@ -0,0 +1,47 @@
+import html
+from django.db.models import QuerySet, FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+
+from products.models import Product
+
+FULLTEXT_INDEX_NAME = 'products_product_search_ft'
+
+# name tokens are written twice into the document so a hit in the
+# product name ranks above a hit somewhere in the long description
+NAME_WEIGHT = 2
+
+def tokenize(text: str)->str:
+    r"""
+    Vietnamese aware tokenization, same steps as `reviews.ml_service.main.PreProcessing`:
+    lower, normalize, then `underthesea.word_tokenize` which joins compound words
+    with '_' (e.g. 'điện_thoại'), so MySQL FULLTEXT indexes them as one word
+    """
+    text = html.unescape(strip_tags(text or '')).lower().strip()
+    if not text:
+        return ''
+
+    # loaded on the first search or product save, not by every process importing the views
+    from underthesea import word_tokenize, text_normalize
+
+    text = text_normalize(text)
+    return word_tokenize(text, format="text")
+
+def build_search_document(name: str, description: str)->str:
+    r"""Text stored in `Product.search_document`, backed by a FULLTEXT index"""
+    name_tokens = tokenize(name)
+    return ' '.join([name_tokens] * NAME_WEIGHT + [tokenize(description)])
+
+def search_products(products: QuerySet, query: str)->QuerySet:
+    r"""
+    Filter `products` by `MATCH ... AGAINST` over the FULLTEXT index and annotate
+    a `relevance` score. Ordering is left to the caller, use `-relevance` first
+    """
+    terms = tokenize(query)
+    if not terms:
+        return products.none()
+
+    match_sql = f"MATCH (`{Product._meta.db_table}`.`search_document`) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+    return products.annotate(
+        relevance=RawSQL(match_sql, (terms,), output_field=FloatField())
+    ).filter(relevance__gt=0)
@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from products.models import Category, Product, ProductImg
+from products.category_tree import invalidate_category_tree
+from products.cache import bump_catalog_version, bump_product_version
+from reviews.models import Review
+
+# Product columns which change what a listing page shows or matches
+LISTING_SOURCE_FIELDS = frozenset({
+    'name', 'slug', 'category', 'price', 'is_active',
+    'thumbnail_url', 'description', 'search_document'
+})
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_tree_on_change(sender, instance: Category, **kwargs):
+    r"""
+    Signal handler to drop the cached category tree when a Category is written.
+    Runs after commit so no process can rebuild the cache from uncommitted rows
+    """
+    transaction.on_commit(invalidate_category_tree)
+    transaction.on_commit(bump_catalog_version)
+
+@receiver([post_save, post_delete], sender=Product)
+def bump_product_caches_on_change(sender, instance: Product, update_fields=None, **kwargs):
+    r"""
+    Signal handler to invalidate the cached detail page and listing pages when a Product is written.
+    Partial saves of columns listings don't show (mean_rating, stock) keep the listing cache
+    """
+    product_id = instance.pk
+    transaction.on_commit(lambda: bump_product_version(product_id))
+
+    if update_fields is not None and not LISTING_SOURCE_FIELDS.intersection(update_fields):
+        return
+
+    transaction.on_commit(bump_catalog_version)
+
+@receiver([post_save, post_delete], sender=ProductImg)
+@receiver([post_save, post_delete], sender=Review)
+def bump_product_version_on_related_change(sender, instance: ProductImg | Review, **kwargs):
+    r"""Signal handler to invalidate the cached detail page of the product an image/review belongs to"""
+    product_id = instance.product_id
+    transaction.on_commit(lambda: bump_product_version(product_id))
@@ -0,0 +1,27 @@
+from django.db.models import QuerySet
+
+# Product columns a listing card shows
+LISTING_FIELDS = ('id', 'name', 'price', 'thumbnail_url', 'created_at')
+
+def parse_price_range(price_min: str | None, price_max: str | None)->tuple[int, int] | None:
+    r"""
+    Parse `price_min`, `price_max` query params.
+    Returns None when the range is missing, raises ValueError when it is invalid
+    """
+    if price_min is None or price_max is None:
+        return None
+
+    price_min = int(price_min)
+    price_max = int(price_max)
+    if price_max <= price_min:
+        raise ValueError(f"price_max ({price_max}) must be greater than price_min ({price_min})")
+
+    return price_min, price_max
+
+def filter_price_range(products: QuerySet, price_range: tuple[int, int] | None)->QuerySet:
+    r"""Apply price range filter (both bounds inclusive) on a product queryset"""
+    if price_range is None:
+        return products
+
+    price_min, price_max = price_range
+    return products.filter(price__gte=price_min, price__lte=price_max)
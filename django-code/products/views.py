@@ -1,16 +1,34 @@
-from django.shortcuts import render, get_object_or_404, redirect
-from django.views.decorators.cache import cache_control
-from django.http import HttpRequest
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.core.cache import cache
+from django.views.decorators.http import condition
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.conf import settings
+from django.http import HttpRequest, Http404
 from django.core.paginator import Paginator
-from django.db.models import Q, Prefetch
+from django.db.models import QuerySet
 from django.contrib import messages
 from django_ratelimit.decorators import ratelimit
+from urllib.parse import urlencode
+from functools import wraps
+import datetime
+import hashlib
 
 TEMPLATE_FOLDER_NAME = 'products'
+PAGE_SIZE = 12
+PRODUCT_DETAIL_PUBLIC_MAX_AGE = 60
 
 from reviews.forms import ReviewForm
-from products.models import Product, Category
-from orders.models import Order
+from products.models import Product
+from products.category_tree import get_category_tree
+from products.cache import listing_cache_key, get_product_version, LISTING_CACHE_TIMEOUT
+from products.detail import load_product_detail, ProductDetail
+from products.pagination import CursorPaginator
+from products.search import search_products
+from products.utils import parse_price_range, filter_price_range, LISTING_FIELDS
+from orders.utils import get_purchased_product_ids
+from carts.cart import Cart
 
 @ratelimit(key='ip', rate='5/m', block=True)
 def product_list(
@@ -19,82 +37,204 @@ def product_list(
         category_id: int = None
     ):
     
-    parent_categories = Category.objects.filter(parent__isnull=True).order_by('name')
-    categories_tree = parent_categories.prefetch_related(
-        Prefetch('children', queryset=Category.objects.order_by('name'), to_attr='subcategories')
-    )
+    # cached in redis + per-process memo, no db query in steady state
+    category_tree = get_category_tree()
+    target_category = None
     query = None
 
-    price_min = request.GET.get('price_min')
-    price_max = request.GET.get('price_max')
-
-    if price_min is not None and price_max is not None:
-        try:
-            price_min = int(price_min)
-            price_max = int(price_max)
-            assert price_max > price_min
-            print(price_min, price_max)
-        except Exception as e:
-            messages.error(request, "giá trị min max không hợp lệ")
-            redirect(request.path)
+    try:
+        price_range = parse_price_range(request.GET.get('price_min'), request.GET.get('price_max'))
+    except ValueError as e:
+        print(e)
+        messages.error(request, "giá trị min max không hợp lệ")
+        price_range = None
 
     if category_slug is not None and category_id is not None:
-        target_parent_cate = categories_tree.filter(id=category_id).first()
-
-        if target_parent_cate:
-            sub_categories = target_parent_cate.subcategories
-            products = []
-            if price_min is not None and price_max is not None:
-                for sub_cate in sub_categories:
-                    products_queryset = sub_cate.products.filter(price__gte=price_min).filter(price__lte=price_max)
-                    products.extend(products_queryset.all())
-            else:
-                for sub_cate in sub_categories:
-                    products.extend(sub_cate.products.all())
-        else:
-            taget_category = Category.objects.get(id = category_id, slug = category_slug)
-            products = Product.objects.filter(category = taget_category)
-            if price_min is not None and price_max is not None:
-                products = products.filter(price__gte=price_min).filter(price__lte=price_max)
+        target_category = category_tree.get(category_id)
+        if target_category is None or target_category.slug != category_slug:
+            raise Http404("Category not found")
+    else:
+        query = (request.GET.get('q') or '').strip() or None
 
+    # normalized params, unknown query params (tracking tags, ...) never reach the cache key
+    listing_params = {
+        'category_id': target_category.id if target_category is not None else None,
+        'query': query,
+        'price_range': price_range,
+    }
+    # only real pages reach the key: forged cursors and out of range page numbers
+    # fall back to page 1 / the last page instead of adding cache entries
+    products, ordering = _listing_queryset(target_category, query, price_range)
+    cursor = request.GET.get('cursor')
+    if cursor and CursorPaginator(products, PAGE_SIZE, ordering=ordering).decode_cursor(cursor)[0] is not None:
+        listing_params['cursor'] = cursor
     else:
-        query = request.GET.get('q')
-        products = Product.objects.all().order_by('-created_at')
-        if query:
-            products = products.filter(Q(name__icontains=query) | Q(description__icontains=query))
-            if price_min is not None and price_max is not None:
-                products = products.filter(price__gte=price_min).filter(price__lte=price_max)
-
-    paginator = Paginator(products, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+        listing_params['page'] = min(
+            _normalize_page_number(request.GET.get('page')),
+            _listing_num_pages(products, listing_params)
+        )
+
+    # rendered cards + pagination are the same for every visitor, keyed by catalog version
+    cache_key = listing_cache_key(listing_params)
+    listing_fragments = cache.get(cache_key)
+    if listing_fragments is None:
+        listing_fragments = _render_listing_fragments(products, ordering, query, price_range, listing_params)
+        cache.set(cache_key, listing_fragments, timeout=LISTING_CACHE_TIMEOUT)
+
+    listing_html, pagination_html = listing_fragments
     
     return render(
         request, 
         f'{TEMPLATE_FOLDER_NAME}/product_list.html', 
         {
-            'page_obj': page_obj, 
+            'listing_html': mark_safe(listing_html),
+            'pagination_html': mark_safe(pagination_html),
             'query': query,
-            'categories_tree': categories_tree
+            'categories_tree': category_tree.roots
         }
     )
 
-@cache_control(no_cache=True, must_revalidate=True, no_store=True)
+def _normalize_page_number(page_number: str | None)->int:
+    try:
+        return max(int(page_number), 1)
+    except (TypeError, ValueError):
+        return 1
+
+def _listing_queryset(target_category, query: str | None, price_range: tuple[int, int] | None)->tuple[QuerySet, tuple[str, ...]]:
+    r"""Lazy queryset of one listing and its ordering, nothing is queried here"""
+    # only columns rendered by listing cards, `description` is never loaded here
+    products = Product.objects.only(*LISTING_FIELDS)
+    ordering = ('-created_at', '-id')
+
+    if target_category is not None:
+        # whole subtree at any depth as one indexed prefix predicate on the category path
+        products = products.filter(category__path__startswith = target_category.path)
+
+    elif query:
+        # FULLTEXT match instead of LIKE '%...%' scan, best matches first
+        products = search_products(products, query)
+        ordering = ('-relevance',) + ordering
+
+    return filter_price_range(products, price_range).order_by(*ordering), ordering
+
+def _listing_num_pages(products: QuerySet, listing_params: dict)->int:
+    r"""Page count of a listing, the COUNT(*) is cached with the catalog version like the fragments"""
+    cache_key = listing_cache_key({**listing_params, 'num_pages': True})
+    num_pages = cache.get(cache_key)
+    if num_pages is None:
+        num_pages = Paginator(products, PAGE_SIZE).num_pages
+        cache.set(cache_key, num_pages, timeout=LISTING_CACHE_TIMEOUT)
+
+    return num_pages
+
+def _render_listing_fragments(products: QuerySet, ordering: tuple[str, ...], query: str | None, price_range: tuple[int, int] | None, listing_params: dict)->tuple[str, str]:
+    r"""Query one listing page and render its product cards and pagination links"""
+    if 'cursor' in listing_params:
+        # keyset mode for crawlers and infinite scroll: constant cost per page, no COUNT(*)
+        paginator = CursorPaginator(products, PAGE_SIZE, ordering=ordering)
+        page_obj = paginator.get_page(listing_params['cursor'])
+    else:
+        # queryset stays lazy, Paginator pushes COUNT and LIMIT/OFFSET into the db
+        paginator = Paginator(products, PAGE_SIZE)
+        page_obj = paginator.get_page(listing_params['page'])
+
+    # keep search and price filter when following pagination links
+    pagination_params = {}
+    if query:
+        pagination_params['q'] = query
+    if price_range is not None:
+        pagination_params['price_min'], pagination_params['price_max'] = price_range
+
+    context = {
+        'page_obj': page_obj,
+        'pagination_query': f'&{urlencode(pagination_params)}' if pagination_params else '',
+    }
+    return (
+        render_to_string(f'{TEMPLATE_FOLDER_NAME}/listing.component.html', context),
+        render_to_string(f'{TEMPLATE_FOLDER_NAME}/pagination.component.html', context),
+    )
+
+def _get_product_detail(request: HttpRequest, product_id: int)->ProductDetail | None:
+    r"""`load_product_detail` memoized on the request, shared by the etag functions and the view"""
+    memo = request.__dict__.setdefault('_product_detail_memo', {})
+    if product_id not in memo:
+        try:
+            memo[product_id] = load_product_detail(product_id)
+        except Product.DoesNotExist:
+            memo[product_id] = None
+
+    return memo[product_id]
+
+def _product_detail_etag(request: HttpRequest, id: int)->str | None:
+    r"""
+    ETag from the product version (covers `updated_at`, images, reviews), the latest
+    review time and what differs per user: review eligibility, cart badge, csrf secret
+    """
+    detail = _get_product_detail(request, id)
+    if detail is None:
+        return None
+
+    # a pending flash message ("Added to cart") must be rendered, never answer 304
+    if len(messages.get_messages(request)) > 0:
+        return None
+
+    parts = [
+        get_product_version(id),
+        str(detail['product'].updated_at.timestamp()),
+        str(detail['latest_review_at'].timestamp() if detail['latest_review_at'] else ''),
+    ]
+    if request.user.is_authenticated:
+        parts += [
+            str(request.user.pk),
+            str(detail['product'].id in get_purchased_product_ids(request.user.pk)),
+            str(len(Cart(request))),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        ]
+    else:
+        parts.append('anonymous')
+
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:32]
+
+def _product_detail_last_modified(request: HttpRequest, id: int)->datetime.datetime | None:
+    r"""Only for the shared anonymous variant, user specific state has no timestamp"""
+    detail = _get_product_detail(request, id)
+    if detail is None or request.user.is_authenticated:
+        return None
+
+    return max(filter(None, [detail['product'].updated_at, detail['latest_review_at']]))
+
+def _product_detail_cache_headers(view_func):
+    r"""
+    Anonymous pages are identical for everyone, let browsers and the gateway reuse them.
+    Pages of signed in users stay private and are revalidated with their ETag
+    """
+    @wraps(view_func)
+    def _wrapped_view(request: HttpRequest, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, public=True, max_age=PRODUCT_DETAIL_PUBLIC_MAX_AGE)
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+    return _wrapped_view
+
+@_product_detail_cache_headers
+@condition(etag_func=_product_detail_etag, last_modified_func=_product_detail_last_modified)
 def product_detail(request: HttpRequest, id:int):
     try:
-        product = get_object_or_404(
-            Product.objects.prefetch_related('reviews__user'),
-            id=id
-        )
+        # product, images and capped reviews, cached by product version
+        detail = _get_product_detail(request, id)
+        if detail is None:
+            raise Http404("Product not found")
 
+        product = detail['product']
         rounded_mean_rating = round(product.mean_rating*100,1) if product.mean_rating is not None else None
         
         allow_to_review = None
         if request.user.is_authenticated:
-            allow_to_review: bool = Order.objects.filter(
-                user = request.user,
-                items__product=product
-            ).exists()
+            allow_to_review: bool = product.id in get_purchased_product_ids(request.user.pk)
         else:
             allow_to_review = False
 
@@ -103,6 +243,9 @@ def product_detail(request: HttpRequest, id:int):
             f'{TEMPLATE_FOLDER_NAME}/product_detail.html', 
             {
                 'product': product,
+                'image_urls': detail['image_urls'],
+                'reviews': detail['reviews'],
+                'review_count': detail['review_count'],
                 'mean_rating': rounded_mean_rating,
                 'allow_to_review': allow_to_review,
                 'review_form': ReviewForm()
@@ -5,5 +5,5 @@ class ReviewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reviews'
 
-    # def ready(self):
-    #     import reviews.signals
\ No newline at end of file
+    def ready(self):
+        import reviews.signals
@@ -0,0 +1,113 @@
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import BooleanField, Case, Value, When
+
+from reviews.ml_service import get_predictor_instance
+from reviews.models import Review
+from reviews.utils import reconcile_product_ratings
+
+CHECKPOINT_KEY = 'reviews:rescore:checkpoint:{run}'
+RECONCILE_BATCH_SIZE = 1000
+
+class Command(BaseCommand):
+    help = (
+        "Re-run sentiment scoring over existing reviews in primary key order, in batches, "
+        "resumable from a checkpoint. Rating counters and mean rating of the touched "
+        "products are recomputed at the end"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help="reviews per predict call and bulk update")
+        parser.add_argument('--chunk-size', type=int, default=500, help="rows fetched per round trip")
+        parser.add_argument('--workers', type=int, default=0, help="preprocessing processes, 0 for serial")
+        parser.add_argument('--only-unscored', action='store_true', help="skip reviews which already have a score")
+        parser.add_argument('--run', default='latest', help="checkpoint name, one per model rollout")
+        parser.add_argument('--reset', action='store_true', help="ignore and overwrite an existing checkpoint")
+
+    def handle(self, *args, **options):
+        checkpoint_key = CHECKPOINT_KEY.format(run=options['run'])
+        checkpoint = None if options['reset'] else cache.get(checkpoint_key)
+        if checkpoint is None:
+            checkpoint = {'last_pk': None, 'processed': 0, 'changed': 0, 'product_ids': []}
+        else:
+            self.stdout.write(f"Resuming after {checkpoint['last_pk']} ({checkpoint['processed']} reviews done)")
+
+        product_ids = set(checkpoint['product_ids'])
+        predictor = get_predictor_instance()
+        start = time.perf_counter()
+        processed_this_run = 0
+
+        with predictor.parallel_preprocessing(workers=options['workers'] or 1):
+            while True:
+                batch = self._next_batch(checkpoint['last_pk'], options)
+                if not batch:
+                    break
+
+                scores = predictor.forward([content for _, _, content, _ in batch])
+                changed = [
+                    (review_id, product_id, score)
+                    for (review_id, product_id, _, old_score), score in zip(batch, scores)
+                    if old_score != score
+                ]
+                self._write_scores(changed)
+
+                product_ids.update(product_id for _, product_id, _ in changed)
+                checkpoint = {
+                    'last_pk': str(batch[-1][0]),
+                    'processed': checkpoint['processed'] + len(batch),
+                    'changed': checkpoint['changed'] + len(changed),
+                    'product_ids': sorted(product_ids),
+                }
+                cache.set(checkpoint_key, checkpoint, timeout=None)
+
+                processed_this_run += len(batch)
+                self.stdout.write(
+                    f"{checkpoint['processed']} reviews, {checkpoint['changed']} changed, "
+                    f"{processed_this_run / (time.perf_counter() - start):.1f} reviews/s"
+                )
+
+        self.stdout.write("Recomputing ratings of %d products..." % len(product_ids))
+        sorted_ids = sorted(product_ids)
+        for start_index in range(0, len(sorted_ids), RECONCILE_BATCH_SIZE):
+            reconcile_product_ratings(sorted_ids[start_index:start_index + RECONCILE_BATCH_SIZE])
+
+        cache.delete(checkpoint_key)
+
+        stats = predictor.preprocessing_stats()
+        for stage, stage_stats in stats['stages'].items():
+            self.stdout.write(f"  {stage:<10} {stage_stats['seconds']:.2f}s ({stage_stats['share']:.0%})")
+        self.stdout.write(f"  memo hits {stats['memo_hits']}, misses {stats['memo_misses']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rescored {checkpoint['processed']} reviews, {checkpoint['changed']} changed"
+        ))
+
+    @staticmethod
+    def _next_batch(last_pk: str | None, options: dict)->list[tuple]:
+        r"""Next keyset page `WHERE id > last_pk ORDER BY id LIMIT batch_size`, streamed in chunks"""
+        reviews = Review.objects.order_by('pk')
+        if last_pk is not None:
+            reviews = reviews.filter(pk__gt=last_pk)
+        if options['only_unscored']:
+            reviews = reviews.filter(score__isnull=True)
+
+        return list(
+            reviews.values_list('id', 'product_id', 'content', 'score')[:options['batch_size']]
+            .iterator(chunk_size=options['chunk_size'])
+        )
+
+    @staticmethod
+    def _write_scores(changed: list[tuple]):
+        r"""One `UPDATE ... CASE` for the reviews whose score changed"""
+        if not changed:
+            return
+
+        with transaction.atomic():
+            Review.objects.filter(pk__in=[review_id for review_id, _, _ in changed]).update(
+                score=Case(
+                    *[When(pk=review_id, then=Value(score)) for review_id, _, score in changed],
+                    output_field=BooleanField()
+                )
+            )
@@ -1,6 +1,44 @@
-from .main import ModelServing
+import os
+import threading
 
-SENTIMENT_PREDICTOR_INSTANCE = ModelServing() 
+# processes which never score reviews (the web server) set this to fail fast
+# instead of downloading and loading the model on an accidental call
+SENTIMENT_MODEL_DISABLED_ENV = 'SENTIMENT_MODEL_DISABLED'
+
+_PREDICTOR_INSTANCE = None
+_PREDICTOR_LOCK = threading.Lock()
 
 def get_predictor_instance():
-    return SENTIMENT_PREDICTOR_INSTANCE
\ No newline at end of file
+    r"""
+    Shared `ModelServing`, loaded on first use (double checked under a lock so
+    concurrent threads load it once). Celery workers load it in the parent
+    before forking, see `preload_predictor_instance`
+    """
+    global _PREDICTOR_INSTANCE
+    if _PREDICTOR_INSTANCE is not None:
+        return _PREDICTOR_INSTANCE
+
+    if os.environ.get(SENTIMENT_MODEL_DISABLED_ENV) == '1':
+        raise RuntimeError(f"sentiment model is disabled in this process ({SENTIMENT_MODEL_DISABLED_ENV}=1)")
+
+    with _PREDICTOR_LOCK:
+        if _PREDICTOR_INSTANCE is None:
+            # heavy imports (underthesea, fasttext) are deferred with the model
+            from .main import ModelServing
+
+            instance = ModelServing()
+            # ModelServing prints and swallows load errors, retry on next call
+            if not hasattr(instance, '_model'):
+                raise RuntimeError("sentiment model failed to load")
+            _PREDICTOR_INSTANCE = instance
+
+    return _PREDICTOR_INSTANCE
+
+def preload_predictor_instance():
+    r"""
+    Load the model in the current process unless disabled. Called in the celery
+    parent before the pool forks, so children share the model pages copy-on-write
+    """
+    if os.environ.get(SENTIMENT_MODEL_DISABLED_ENV) == '1':
+        return
+    get_predictor_instance()
@@ -1,9 +1,12 @@
 from huggingface_hub import hf_hub_download
 from underthesea import word_tokenize, text_normalize
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
 import emoji
 import fasttext
 import re
 import os
+import time
 
 class PreProcessing(object):
 
@@ -48,7 +51,16 @@ class PreProcessing(object):
     
     _remove_str = ["♡ ♡ ♡","❤","\=\)\)\)", "\=\)\)", "\=\)","\:\)\)\)", "\:\)\)", "\:\)"]
 
-    def _get_replacements_pattern(self):
+    _comma_pattern = re.compile(r"\,\s")
+
+    # stages in pipeline order, keys of the timing stats
+    STAGES = ('lower', 'normalize', 'emoji', 'remove', 'replace', 'comma', 'tokenize')
+
+    # joins texts for the batched regex stages, never produced by nor matched by any stage
+    _BATCH_SEPARATOR = '\x00'
+
+    @staticmethod
+    def _get_replacements_pattern():
         replacements = {}
 
         for k,v in PreProcessing._replacements.items():
@@ -60,33 +72,154 @@ class PreProcessing(object):
 
         return re.compile("|".join(replacements.keys())), replacements, re.compile("|".join(PreProcessing._remove_str))
         
-    def __init__(self):
-        self._replacements_pattern, self.replacements, self._remove_pattern = self._get_replacements_pattern()
+    def __init__(self, memo_size: int = 50_000):
+        r"""
+        `memo_size` bounds the LRU memo of outputs by raw text, reviews are short
+        and repetitive so most of them skip the pipeline (and tokenization) entirely
+        """
+        self._replacements_pattern, self.replacements, self._remove_pattern = PreProcessing._compiled_patterns
+        self._memo_size = memo_size
+        self._memo: OrderedDict[str, str] = OrderedDict()
+        self.reset_stats()
 
+    def reset_stats(self):
+        self._stage_seconds = defaultdict(float)
+        self._memo_hits = 0
+        self._memo_misses = 0
 
-    def forward(self, text:str):
-        # 1. lower all string
-        text = text.lower()
+    def stats(self)->dict:
+        r"""
+        Cumulative seconds and share of time per stage plus memo hits/misses
+        since creation or the last `reset_stats`
+        """
+        total = sum(self._stage_seconds.values())
+        return {
+            'stages': {
+                stage: {
+                    'seconds': self._stage_seconds[stage],
+                    'share': self._stage_seconds[stage] / total if total else 0.0
+                }
+                for stage in self.STAGES
+            },
+            'memo_hits': self._memo_hits,
+            'memo_misses': self._memo_misses,
+            'memo_size': len(self._memo),
+        }
 
-        # 2. normalize
-        text = text_normalize(text)
+    def _memo_get(self, text: str)->str | None:
+        output = self._memo.get(text)
+        if output is None:
+            self._memo_misses += 1
+            return None
+
+        self._memo_hits += 1
+        self._memo.move_to_end(text)
+        return output
 
+    def _memo_put(self, text: str, output: str):
+        self._memo[text] = output
+        self._memo.move_to_end(text)
+        if len(self._memo) > self._memo_size:
+            self._memo.popitem(last=False)
+
+    def _timed(self, stage: str, func, value):
+        start = time.perf_counter()
+        value = func(value)
+        self._stage_seconds[stage] += time.perf_counter() - start
+        return value
+
+    def _regex_stages(self, text: str)->str:
         # 3. remove emojies
-        text = emoji.replace_emoji(text, replace='')
+        text = self._timed('emoji', lambda value: emoji.replace_emoji(value, replace=''), text)
 
         # 4. remove words
-        text = self._remove_pattern.sub('', text)
+        text = self._timed('remove', lambda value: self._remove_pattern.sub('', value), text)
 
         # 5. replace words
-        text = self._replacements_pattern.sub(lambda match: self.replacements[match.group()], text)
+        text = self._timed(
+            'replace',
+            lambda value: self._replacements_pattern.sub(lambda match: self.replacements[match.group()], value),
+            text
+        )
 
         # 6. remove any ',' left after cleaning words
-        text = re.sub(r"\,\s",'',text)
+        return self._timed('comma', lambda value: self._comma_pattern.sub('', value), text)
+
+    def _normalize(self, text: str)->str:
+        # 1. lower all string
+        text = self._timed('lower', str.lower, text)
 
+        # 2. normalize
+        return self._timed('normalize', text_normalize, text)
+
+    def _tokenize(self, text: str)->str:
         # 7. tokenize via underthesea
-        text = word_tokenize(text, format="text")
+        return self._timed('tokenize', lambda value: word_tokenize(value, format="text"), text)
+
+    def forward(self, text:str):
+        output = self._memo_get(text)
+        if output is None:
+            output = self._tokenize(self._regex_stages(self._normalize(text)))
+            self._memo_put(text, output)
 
-        return text
+        return output
+
+    def forward_batch(self, texts: list[str])->list[str]:
+        r"""
+        Same output as `[self.forward(text) for text in texts]`. Memo hits and
+        duplicates are processed once, the regex stages run once over the
+        remaining texts joined by a separator none of the patterns can match across
+        """
+        outputs, pending = self.split_memo_hits(texts)
+
+        for text, output in zip(pending, self.process_misses(pending)):
+            self._memo_put(text, output)
+            outputs[text] = output
+
+        return [outputs[text] for text in texts]
+
+    def split_memo_hits(self, texts: list[str])->tuple[dict[str, str | None], list[str]]:
+        r"""
+        Outputs of memo hits by text (None for misses) and the unique misses in input order,
+        every distinct text is looked up (and counted) once
+        """
+        outputs = {}
+        pending = []
+        for text in texts:
+            if text in outputs:
+                continue
+            output = self._memo_get(text)
+            if output is None:
+                pending.append(text)
+            outputs[text] = output
+
+        return outputs, pending
+
+    def process_misses(self, texts: list[str])->list[str]:
+        r"""Run the pipeline over texts known to miss the memo, without memo lookups or writes"""
+        if not texts:
+            return []
+
+        normalized = [self._normalize(text) for text in texts]
+
+        if any(self._BATCH_SEPARATOR in text for text in normalized):
+            cleaned = [self._regex_stages(text) for text in normalized]
+        else:
+            cleaned = self._regex_stages(self._BATCH_SEPARATOR.join(normalized)).split(self._BATCH_SEPARATOR)
+
+        return [self._tokenize(cleaned_text) for cleaned_text in cleaned]
+
+    def stage_seconds(self)->dict[str, float]:
+        r"""Cumulative seconds per stage, the raw numbers behind `stats`"""
+        return dict(self._stage_seconds)
+
+    def add_stage_seconds(self, stage_seconds: dict[str, float]):
+        r"""Merge stage timings measured elsewhere (pool workers) into these stats"""
+        for stage, seconds in stage_seconds.items():
+            self._stage_seconds[stage] += seconds
+
+
+PreProcessing._compiled_patterns = PreProcessing._get_replacements_pattern()
 
 
 class ModelServing(object):
@@ -101,13 +234,34 @@ class ModelServing(object):
             self._model = fasttext.load_model(_model_path)
         except Exception as e:
             print(e)
+        self._parallel = None
+
+    @contextmanager
+    def parallel_preprocessing(self, workers: int | None = None, chunk_size: int | None = None):
+        r"""
+        Within the block, `forward` preprocesses large batches on a process pool
+        (bulk scoring: migrations, management commands). The pool is shut down on exit
+        """
+        from .parallel import ParallelPreProcessing
+
+        with ParallelPreProcessing(self._pre_processing, workers=workers, chunk_size=chunk_size) as parallel:
+            self._parallel = parallel
+            try:
+                yield self
+            finally:
+                self._parallel = None
+
+    def preprocessing_stats(self)->dict:
+        r"""Per-stage timings and memo counters of this process, see `PreProcessing.stats`"""
+        return self._pre_processing.stats()
 
     def forward(self, text:str | list[str])->bool | list[bool]:
         output_single = False
         if isinstance(text, str):
             text = [text]
             output_single = True
-        processed_text = [self._pre_processing.forward(_text) for _text in text]
+        pre_processing = self._parallel if self._parallel is not None else self._pre_processing
+        processed_text = pre_processing.forward_batch(text)
         labels, probs = self._model.predict(processed_text)
         
         outputs = [int(ele[0][-1]) == 1  for ele in labels]
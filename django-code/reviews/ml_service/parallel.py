@@ -0,0 +1,98 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .main import PreProcessing
+
+# below this many texts (after memo hits/duplicates) the pool costs more than it saves
+PARALLEL_MIN_TEXTS = 256
+# chunks are small enough to balance CRF tokenization across workers,
+# large enough to amortize pickling
+MIN_CHUNK_SIZE = 32
+MAX_CHUNK_SIZE = 1024
+CHUNKS_PER_WORKER = 4
+
+_WORKER_PRE_PROCESSING: PreProcessing | None = None
+
+def _init_worker():
+    global _WORKER_PRE_PROCESSING
+    # the parent dedupes and memoizes, workers only see misses
+    _WORKER_PRE_PROCESSING = PreProcessing(memo_size=0)
+
+def _process_chunk(texts: list[str])->tuple[list[str], dict[str, float]]:
+    r"""Outputs of a chunk and the stage timings spent on it, merged into the parent stats"""
+    _WORKER_PRE_PROCESSING.reset_stats()
+    outputs = _WORKER_PRE_PROCESSING.process_misses(texts)
+    return outputs, _WORKER_PRE_PROCESSING.stage_seconds()
+
+
+class ParallelPreProcessing(object):
+    r"""
+    Shards `PreProcessing.forward_batch` across a process pool, `underthesea.word_tokenize`
+    holds the GIL so threads would not help. Results keep input order and land in
+    the memo of the wrapped (parent) `PreProcessing`.
+
+    The pool is started on first use and kept until `close()`, use as a context manager.
+    Falls back to serial processing when a pool cannot be used, e.g. inside daemonic
+    celery prefork children which may not have children of their own
+    """
+    def __init__(self, pre_processing: PreProcessing, workers: int | None = None, chunk_size: int | None = None):
+        self.pre_processing = pre_processing
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._executor: ProcessPoolExecutor | None = None
+        self._disabled = self.workers <= 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def chunk_size_for(self, total: int)->int:
+        r"""A few chunks per worker so slow chunks don't leave workers idle"""
+        if self.chunk_size is not None:
+            return self.chunk_size
+        return min(MAX_CHUNK_SIZE, max(MIN_CHUNK_SIZE, math.ceil(total / (self.workers * CHUNKS_PER_WORKER))))
+
+    def forward_batch(self, texts: list[str])->list[str]:
+        # memo hits and duplicates never leave this process
+        outputs, pending = self.pre_processing.split_memo_hits(texts)
+
+        if len(pending) < PARALLEL_MIN_TEXTS or self._disabled:
+            processed = self.pre_processing.process_misses(pending)
+        else:
+            processed = self._forward_parallel(pending)
+
+        for text, output in zip(pending, processed):
+            self.pre_processing._memo_put(text, output)
+            outputs[text] = output
+
+        return [outputs[text] for text in texts]
+
+    def _forward_parallel(self, texts: list[str])->list[str]:
+        chunk_size = self.chunk_size_for(len(texts))
+        chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+        try:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker
+                )
+            # map yields results in submission order
+            outputs = []
+            for chunk_outputs, stage_seconds in self._executor.map(_process_chunk, chunks):
+                outputs.extend(chunk_outputs)
+                self.pre_processing.add_stage_seconds(stage_seconds)
+            return outputs
+
+        except Exception as e:
+            print(f"Parallel preprocessing unavailable, falling back to serial: {e}")
+            self._disabled = True
+            self.close()
+            return self.pre_processing.process_misses(texts)
@@ -14,4 +14,13 @@ class Review(models.Model):
     user = models.ForeignKey(AppUser, on_delete=models.CASCADE)
     content = models.TextField()
     score = models.BooleanField(null=True, default=None) # True for positive, False for negative
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # scored reviews of a product (mean rating): WHERE product_id = ? AND score IS NOT NULL
+            models.Index(fields=['product', 'score'], name='reviews_product_score_idx'),
+            # latest reviews on the detail page: WHERE product_id = ? ORDER BY created_at DESC
+            models.Index(fields=['product', '-created_at'], name='reviews_product_created_idx'),
+        ]
+
@@ -1,13 +1,17 @@
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import Review
 
-from .tasks import predict_ml_score
+from .tasks import enqueue_review_scoring
 
 @receiver(post_save, sender=Review)
 def update_product_mean_rating(sender, instance: Review, created, **kwargs):
     r"""
     Signal handler to update the Product's mean rating when a create Review is created.
+    The review joins the next inference batch once its row is committed
     """
     if created:
-        predict_ml_score.delay(instance.id, instance.content)
\ No newline at end of file
+        review_id = instance.id
+        # robust: with redis down the review is still saved, `sweep_unscored_reviews` scores it later
+        transaction.on_commit(lambda: enqueue_review_scoring(review_id), robust=True)
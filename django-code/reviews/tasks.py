@@ -1,53 +1,139 @@
 from celery import shared_task
-from django.db.models import Avg
+from collections import Counter
+from datetime import timedelta
+from django.utils import timezone
+from django.db import transaction
+from django.db.models import BooleanField, Case, Value, When
+from django_redis import get_redis_connection
 import uuid
 
 from reviews.models import Review
 from products.models import Product
-from reviews.ml_service import get_predictor_instance
+from reviews.utils import apply_review_scores, reconcile_product_ratings
+
+RECONCILE_BATCH_SIZE = 1000
+
+# micro batching of sentiment inference: reviews wait in a redis list until
+# SCORE_BATCH_SIZE of them are queued or SCORE_BATCH_MAX_WAIT seconds passed
+PENDING_REVIEWS_KEY = 'reviews:pending_scores'
+SCORE_BATCH_SIZE = 64
+SCORE_BATCH_MAX_WAIT = 0.5
+# reviews still unscored after this were dropped from the batch path (lost flush, crashed worker)
+UNSCORED_SWEEP_AFTER = timedelta(minutes=10)
+UNSCORED_SWEEP_LIMIT = 1000
+
+
+def enqueue_review_scoring(review_id: uuid.UUID):
+    r"""
+    Queue a review for the next batch. The first review of a window schedules
+    the flush after `SCORE_BATCH_MAX_WAIT`, a full batch flushes right away
+    """
+    pending = get_redis_connection('default').rpush(PENDING_REVIEWS_KEY, str(review_id))
+
+    if pending == 1:
+        flush_pending_reviews.apply_async(countdown=SCORE_BATCH_MAX_WAIT)
+    elif pending % SCORE_BATCH_SIZE == 0:
+        flush_pending_reviews.delay()
 
 
 @shared_task
-def predict_ml_score(review_id: uuid.UUID, review_text: str):
+def flush_pending_reviews():
+    """
+    Worker action: drains the pending list in batches of `SCORE_BATCH_SIZE`,
+    scores each batch with one predict call.
     """
-    Worker action: Takes the review text, predicts the score, 
-    and then calls the next task to update the product.
+    redis = get_redis_connection('default')
+    while True:
+        review_ids = redis.lpop(PENDING_REVIEWS_KEY, SCORE_BATCH_SIZE)
+        if not review_ids:
+            break
+
+        score_reviews([review_id.decode() for review_id in review_ids])
+
+
+def score_reviews(review_ids: list[str]):
+    r"""
+    Predict the scores of a batch of unscored reviews, write them with one
+    `UPDATE ... CASE` and add them to the rating counters once per product
     """
-    try:
-        # 1 get the instance
-        predictor = get_predictor_instance()
+    # the model is loaded by workers only, not by processes importing this module
+    from reviews.ml_service import get_predictor_instance
+
+    reviews = list(
+        Review.objects.filter(pk__in=review_ids, score__isnull=True).values_list('id', 'content')
+    )
+    if not reviews:
+        return
 
-        # 2 prediction
-        predicted_score = predictor.forward(review_text)
-        
-        # 3. Update the Review instance with the predicted score
-        Review.objects.filter(pk=review_id).update(score=predicted_score)
+    predicted_scores = get_predictor_instance().forward([content for _, content in reviews])
+    scores = {review_id: score for (review_id, _), score in zip(reviews, predicted_scores)}
 
-        # 4. Call the next task to calculate the new mean rating for the product
-        rating_instance = Review.objects.get(pk=review_id)
+    with transaction.atomic():
+        # lock the rows still unscored, a concurrent or redelivered batch must not count them twice
+        unscored = list(
+            Review.objects.select_for_update()
+            .filter(pk__in=list(scores), score__isnull=True)
+            .values_list('id', 'product_id')
+        )
+        if not unscored:
+            return
 
-        _update_product_mean_rating.delay(rating_instance.product_id)
-        
-    except Review.DoesNotExist:
-        # Handle case where the rating might have been deleted while task was queued
-        print(f"Rating with ID {review_id} not found.")
+        Review.objects.filter(pk__in=[review_id for review_id, _ in unscored]).update(
+            score=Case(
+                *[When(pk=review_id, then=Value(scores[review_id])) for review_id, _ in unscored],
+                output_field=BooleanField()
+            )
+        )
+
+        scored_per_product = Counter(product_id for _, product_id in unscored)
+        positive_per_product = Counter(product_id for review_id, product_id in unscored if scores[review_id])
+        for product_id, scored in scored_per_product.items():
+            apply_review_scores(product_id, scored=scored, positive=positive_per_product[product_id])
 
 
 @shared_task
-def _update_product_mean_rating(product_id:int):
-    """
-    Worker action: Recalculates the mean rating for the specified Product.
-    """
-    try:
-        product = Product.objects.get(pk=product_id)
-        
-        # Calculate the mean based on the 'score' field
-        average_result = product.reviews.exclude(score__isnull=True).aggregate(Avg('score'))
-        
-        # Update the Product and save
-        product.mean_rating = average_result['score__avg']
-        # Use update_fields
-        product.save(update_fields=['mean_rating'])
-        
-    except Product.DoesNotExist:
-        print(f"Product with ID {product_id} not found.")
\ No newline at end of file
+def sweep_unscored_reviews():
+    """
+    Periodic action: scores reviews left unscored by the batch path,
+    ids popped by a worker which crashed before writing them.
+    """
+    review_ids = list(
+        Review.objects.filter(
+            score__isnull=True,
+            created_at__lt=timezone.now() - UNSCORED_SWEEP_AFTER
+        ).order_by('created_at').values_list('id', flat=True)[:UNSCORED_SWEEP_LIMIT]
+    )
+    for start in range(0, len(review_ids), SCORE_BATCH_SIZE):
+        score_reviews([str(review_id) for review_id in review_ids[start:start + SCORE_BATCH_SIZE]])
+
+    if review_ids:
+        print(f"Swept {len(review_ids)} unscored reviews.")
+
+
+@shared_task
+def predict_ml_score(review_id: uuid.UUID):
+    """
+    Worker action: scores a single review right away, bypassing the batch.
+    """
+    score_reviews([str(review_id)])
+
+
+@shared_task
+def reconcile_product_ratings_task():
+    """
+    Periodic action: recounts scored reviews of every product in id batches
+    and repairs counters / mean rating which drifted (deleted or rescored reviews).
+    """
+    last_id = 0
+    repaired = 0
+    while True:
+        product_ids = list(
+            Product.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:RECONCILE_BATCH_SIZE]
+        )
+        if not product_ids:
+            break
+
+        repaired += reconcile_product_ratings(product_ids)
+        last_id = product_ids[-1]
+
+    print(f"Reconciled rating counters, {repaired} products repaired.")
@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
+
+from products.cache import bump_product_version
+from products.models import Product
+from reviews.models import Review
+
+def apply_review_scores(product_id: int, scored: int, positive: int):
+    r"""
+    Add newly scored reviews to the product counters with atomic increments,
+    then derive `mean_rating` (share of positive reviews) from the counters in O(1)
+    """
+    with transaction.atomic():
+        Product.objects.filter(pk=product_id).update(
+            scored_review_count=F('scored_review_count') + scored,
+            positive_review_count=F('positive_review_count') + positive
+        )
+        # separate statement, column order in a single SET is not portable
+        Product.objects.filter(pk=product_id, scored_review_count__gt=0).update(
+            mean_rating=Cast('positive_review_count', FloatField()) / F('scored_review_count')
+        )
+
+    transaction.on_commit(lambda: bump_product_version(product_id))
+
+def reconcile_product_ratings(product_ids: list[int] | None = None)->int:
+    r"""
+    Recount scored/positive reviews of `product_ids` (all products when None) from
+    the review table and rewrite counters and `mean_rating`. Fixes drift from deleted
+    or rescored reviews. Returns the number of products updated
+    """
+    review_counts = (
+        Review.objects.filter(product_id=OuterRef('pk'), score__isnull=False)
+        .values('product_id')
+        .annotate(
+            scored=Count('pk'),
+            positive=Count('pk', filter=Q(score=True))
+        )
+    )
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+
+    with transaction.atomic():
+        # only rows whose counters differ are written
+        changed_ids = list(
+            products.annotate(
+                actual_scored=Coalesce(Subquery(review_counts.values('scored')), Value(0)),
+                actual_positive=Coalesce(Subquery(review_counts.values('positive')), Value(0)),
+            )
+            .exclude(
+                scored_review_count=F('actual_scored'),
+                positive_review_count=F('actual_positive')
+            )
+            .values_list('pk', flat=True)
+        )
+        if not changed_ids:
+            return 0
+
+        changed = Product.objects.filter(pk__in=changed_ids)
+        changed.update(
+            scored_review_count=Coalesce(Subquery(review_counts.values('scored')), Value(0)),
+            positive_review_count=Coalesce(Subquery(review_counts.values('positive')), Value(0))
+        )
+        changed.filter(scored_review_count=0).update(mean_rating=None)
+        changed.filter(scored_review_count__gt=0).update(
+            mean_rating=Cast('positive_review_count', FloatField()) / F('scored_review_count')
+        )
+
+    for product_id in changed_ids:
+        transaction.on_commit(lambda product_id=product_id: bump_product_version(product_id))
+
+    return len(changed_ids)